@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark: binary tool results in a conversation
+
+Simulates a conversation where a tool returns the same multi-megabyte
+image several times, and compares two ways of turning MCP ImageContent
+into Anthropic image blocks:
+
+- copy: decode and re-encode every image, keep every copy in the messages
+- BlobStore: hash the base64 text, reuse the original string without
+  decoding it, and send repeated images as a short reference
+
+Reports conversion time, peak extra memory (tracemalloc), and the base64
+payload carried by the model request after the last turn.
+
+A second table sends a real PNG over the size limit through BlobStore,
+which downscales it (skipped when Pillow is not installed).
+
+Usage:
+    python bench_binary.py
+    python bench_binary.py --sizes 1 4 16 --repeats 8
+"""
+
+import argparse
+import base64
+import io
+import os
+import time
+import tracemalloc
+
+import mcp.types as types
+
+from binary_content import BlobLimits, BlobStore, Image
+
+
+def copy_convert(content: list[types.ImageContent]) -> list[dict]:
+    """Decode and re-encode each image, as a naive conversion would"""
+    blocks = []
+    for item in content:
+        data = base64.b64decode(item.data)
+        blocks.append(
+            {
+                "type": "image",
+                "source": {
+                    "type": "base64",
+                    "media_type": item.mimeType,
+                    "data": base64.b64encode(data).decode("ascii"),
+                },
+            }
+        )
+    return blocks
+
+
+def payload_bytes(messages: list[dict]) -> int:
+    """Base64 bytes carried by all image blocks in the conversation"""
+    return sum(
+        len(block["source"]["data"])
+        for message in messages
+        for result in message["content"]
+        for block in result["content"]
+        if block["type"] == "image"
+    )
+
+
+def run(convert, results: list[types.ImageContent]) -> tuple[float, int, int]:
+    """Convert each tool result into a new turn; returns (seconds, peak bytes, payload)"""
+    messages = []
+    tracemalloc.start()
+    start = time.perf_counter()
+    for turn, image in enumerate(results):
+        messages.append(
+            {
+                "role": "user",
+                "content": [
+                    {"type": "tool_result", "tool_use_id": f"t{turn}", "content": convert([image])}
+                ],
+            }
+        )
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, payload_bytes(messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark binary tool result handling")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 4, 8], help="Image sizes in MiB")
+    parser.add_argument("--repeats", type=int, default=5, help="Times the same image is returned")
+    args = parser.parse_args()
+
+    print(f"\n{'='*84}")
+    print(f"Binary tool results: same image returned {args.repeats} times in one conversation")
+    print(f"{'='*84}")
+    print(
+        f"{'size':>8} | {'convert ms':>11}{'BlobStore':>11} | "
+        f"{'peak MiB':>9}{'BlobStore':>11} | {'payload MiB':>12}{'BlobStore':>11}"
+    )
+
+    for size_mib in args.sizes:
+        # Random bytes stand in for compressed image data (it does not compress further)
+        b64 = base64.b64encode(os.urandom(int(size_mib * 1024 * 1024))).decode("ascii")
+        results = [
+            types.ImageContent(type="image", data=b64, mimeType="image/png")
+            for _ in range(args.repeats)
+        ]
+
+        copy_time, copy_peak, copy_payload = run(copy_convert, results)
+
+        store = BlobStore(BlobLimits(max_blob_bytes=1 << 30, max_total_bytes=1 << 32))
+        store_time, store_peak, store_payload = run(
+            lambda content: store.tool_result_content(content, "screenshot"), results
+        )
+
+        mib = 1024 * 1024
+        print(
+            f"{size_mib:>5.1f} MiB | {copy_time * 1000:>11.1f}{store_time * 1000:>11.1f} | "
+            f"{copy_peak / mib:>9.1f}{store_peak / mib:>11.1f} | "
+            f"{copy_payload / mib:>12.1f}{store_payload / mib:>11.1f}"
+        )
+
+    print(f"{'='*84}\n")
+    bench_downscale(args.repeats)
+
+
+def bench_downscale(repeats: int):
+    """An oversized PNG through BlobStore's default limits, which downscale it"""
+    print(f"{'='*84}")
+    print(f"Downscaling: oversized PNG returned {repeats} times in one conversation")
+    print(f"{'='*84}")
+    if Image is None:
+        print("Skipped: needs Pillow (pip install pillow)")
+        print(f"{'='*84}\n")
+        return
+
+    # Noise does not compress, so this PNG is about 12 MiB (over the 5 MiB limit)
+    width, height = 2400, 1800
+    buffer = io.BytesIO()
+    Image.frombytes("RGB", (width, height), os.urandom(width * height * 3)).save(buffer, format="PNG")
+    b64 = base64.b64encode(buffer.getbuffer()).decode("ascii")
+    results = [
+        types.ImageContent(type="image", data=b64, mimeType="image/png") for _ in range(repeats)
+    ]
+
+    mib = 1024 * 1024
+    print(f"Original: {width}x{height}, {buffer.tell() / mib:.1f} MiB")
+    print(f"{'limits':<32} | {'convert ms':>11} | {'peak MiB':>9} | {'payload MiB':>12}")
+    for label, limits in [
+        ("default (5 MiB per image)", BlobLimits()),
+        ("max_image_dimension=1568", BlobLimits(max_image_dimension=1568)),
+    ]:
+        store = BlobStore(limits)
+        elapsed, peak, payload = run(
+            lambda content: store.tool_result_content(content, "screenshot"), results
+        )
+        print(f"{label:<32} | {elapsed * 1000:>11.1f} | {peak / mib:>9.1f} | {payload / mib:>12.1f}")
+    print(f"{'='*84}\n")
+
+
+if __name__ == "__main__":
+    main()
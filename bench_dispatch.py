@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: tool dispatch in simple_server
+
+Compares the old server layout (tool list rebuilt on every list_tools,
+if/elif dispatch on the tool name, jsonschema.validate on every call as
+the SDK does by default) with simple_server.ToolRegistry (list built
+once, dict dispatch, validators compiled once), for a growing number of
+tools. Each call targets the last tool, the worst case for an if/elif
+chain.
+
+Usage:
+    python bench_dispatch.py
+    python bench_dispatch.py --tools 3 30 300 --calls 5000
+"""
+
+import argparse
+import asyncio
+import time
+
+import jsonschema
+import mcp.types as types
+
+from simple_server import ToolRegistry
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "a": {"type": "number", "description": "First number"},
+        "b": {"type": "number", "description": "Second number"},
+    },
+    "required": ["a", "b"],
+}
+
+
+def build_legacy(tool_count: int):
+    """list_tools/call_tool in the old style, with a real if/elif chain"""
+
+    def list_tools() -> list[types.Tool]:
+        return [
+            types.Tool(name=f"tool_{i}", description=f"Tool {i}", inputSchema=SCHEMA)
+            for i in range(tool_count)
+        ]
+
+    # Generate the chain so dispatch cost is what hand-written code would pay
+    branches = "\n".join(
+        f"    {'if' if i == 0 else 'elif'} name == 'tool_{i}':\n"
+        f"        return [TextContent(type='text', text=str(arguments['a'] + arguments['b']))]"
+        for i in range(tool_count)
+    )
+    source = (
+        "async def call_tool(name, arguments):\n"
+        f"{branches}\n"
+        "    else:\n"
+        "        raise ValueError(f'Unknown tool: {name}')\n"
+    )
+    namespace = {"TextContent": types.TextContent}
+    exec(source, namespace)
+    dispatch = namespace["call_tool"]
+
+    async def call_tool(name: str, arguments: dict):
+        # What the SDK does before the handler when validate_input=True
+        jsonschema.validate(instance=arguments, schema=SCHEMA)
+        return await dispatch(name, arguments)
+
+    return list_tools, call_tool
+
+
+def build_registry(tool_count: int) -> ToolRegistry:
+    registry = ToolRegistry()
+    for i in range(tool_count):
+
+        async def handler(a: float, b: float):
+            return [types.TextContent(type="text", text=str(a + b))]
+
+        registry.tool(name=f"tool_{i}", description=f"Tool {i}", input_schema=SCHEMA)(handler)
+    return registry
+
+
+async def time_calls(call_tool, name: str, calls: int) -> float:
+    """Mean microseconds per call"""
+    arguments = {"a": 1, "b": 2}
+    start = time.perf_counter()
+    for _ in range(calls):
+        await call_tool(name, arguments)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def time_lists(list_tools, lists: int) -> float:
+    """Mean microseconds per list_tools"""
+    start = time.perf_counter()
+    for _ in range(lists):
+        list_tools()
+    return (time.perf_counter() - start) / lists * 1e6
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark tool dispatch in simple_server")
+    parser.add_argument("--tools", type=int, nargs="+", default=[3, 10, 100, 1000])
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--lists", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"\n{'='*78}")
+    print("Tool dispatch benchmark (microseconds per operation)")
+    print(f"{'='*78}")
+    print(
+        f"{'tools':>6} | {'call: legacy':>13}{'registry':>10}{'speedup':>9} | "
+        f"{'list: legacy':>13}{'registry':>10}{'speedup':>10}"
+    )
+
+    for tool_count in args.tools:
+        legacy_list, legacy_call = build_legacy(tool_count)
+        registry = build_registry(tool_count)
+        last_tool = f"tool_{tool_count - 1}"
+
+        legacy_call_us = await time_calls(legacy_call, last_tool, args.calls)
+        registry_call_us = await time_calls(registry.call_tool, last_tool, args.calls)
+        legacy_list_us = time_lists(legacy_list, args.lists)
+        registry_list_us = time_lists(registry.list_tools, args.lists)
+
+        print(
+            f"{tool_count:>6} | {legacy_call_us:>13.1f}{registry_call_us:>10.1f}"
+            f"{legacy_call_us / registry_call_us:>8.1f}x | "
+            f"{legacy_list_us:>13.1f}{registry_list_us:>10.2f}"
+            f"{legacy_list_us / registry_list_us:>9.0f}x"
+        )
+
+    print(f"{'='*78}\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark: eager vs lazy server startup
+
+Registers many copies of simple_server.py and compares:
+
+- eager: every server is started and initialized up front, and stays
+  up, as the demos do with connect_to_server (registration costs about
+  the same when there is no cached manifest yet, but stops them again)
+- lazy: servers are registered from the cached manifests, and nothing
+  is started until a tool is called
+
+Reports time until all tools are available, RSS of the server processes
+while idle, and the latency of the first and second call to one server.
+RSS is read from /proc, so it is only reported on Linux.
+
+Usage:
+    python bench_lazy_startup.py
+    python bench_lazy_startup.py --servers 20
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+
+from lazy_servers import LazyServerPool
+from load_test import ServerMonitor
+
+
+async def register_all(pool: LazyServerPool, count: int) -> float:
+    start = time.perf_counter()
+    for i in range(count):
+        await pool.register(f"calc-{i}", sys.executable, ["simple_server.py"])
+    return time.perf_counter() - start
+
+
+async def start_all(pool: LazyServerPool) -> float:
+    """Start every registered server; they stay up until the idle timeout"""
+    start = time.perf_counter()
+    for server in pool.servers.values():
+        async with server.use():
+            pass
+    return time.perf_counter() - start
+
+
+async def timed_call(pool: LazyServerPool, tool_name: str) -> float:
+    start = time.perf_counter()
+    async with pool.session_for(tool_name) as session:
+        await session.call_tool(tool_name, {"a": 1, "b": 2})
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark eager vs lazy MCP server startup")
+    parser.add_argument("--servers", type=int, default=10, help="Number of servers to register")
+    args = parser.parse_args()
+
+    monitor = ServerMonitor()
+    mib = 1024 * 1024
+
+    with tempfile.TemporaryDirectory() as manifest_dir:
+        # Registering without cached manifests fills the cache
+        eager = LazyServerPool(idle_timeout=3600, manifest_dir=manifest_dir)
+        await register_all(eager, args.servers)
+
+        # Eager: every server started up front (and kept up)
+        eager_seconds = await start_all(eager)
+        eager_rss = monitor.rss_bytes() if monitor.available else 0
+        await eager.aclose()
+
+        # Lazy: same servers, registered from the manifests cached above
+        lazy = LazyServerPool(idle_timeout=3600, manifest_dir=manifest_dir)
+        lazy_seconds = await register_all(lazy, args.servers)
+        lazy_rss = monitor.rss_bytes() if monitor.available else 0
+
+        # Every copy exposes "add"; the first registered server owns it
+        first_call = await timed_call(lazy, "add")
+        second_call = await timed_call(lazy, "add")
+        await lazy.aclose()
+
+    print(f"\n{'='*60}")
+    print(f"Startup with {args.servers} servers configured")
+    print(f"{'='*60}")
+    print(f"{'':<24}{'eager':>14}{'lazy':>14}")
+    print(f"{'time to tools ready':<24}{eager_seconds * 1000:>11.0f} ms{lazy_seconds * 1000:>11.1f} ms")
+    if monitor.available:
+        print(f"{'idle server RSS':<24}{eager_rss / mib:>10.1f} MiB{lazy_rss / mib:>10.1f} MiB")
+    print(f"\nLazy first call (starts the server): {first_call * 1000:.0f} ms")
+    print(f"Lazy second call (already running):  {second_call * 1000:.1f} ms")
+    print(f"{'='*60}\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Benchmark: session snapshot and restore
+
+Builds synthetic conversations with hundreds of turns (tool calls, text
+results, occasional long results and images, some repeated) and compares
+snapshots.SessionState with plain JSON of the same messages.
+
+Reports save time, file size, restore time (until the chat can continue)
+and the time to load the remaining payloads on first use.
+
+Usage:
+    python bench_snapshot.py
+    python bench_snapshot.py --turns 100 500 2000
+"""
+
+import argparse
+import base64
+import json
+import os
+import tempfile
+import time
+
+from mcp import types
+
+from snapshots import SessionState, materialize
+
+READ_FILE = types.Tool(
+    name="read_file",
+    inputSchema={"type": "object", "properties": {"path": {"type": "string"}}},
+    annotations=types.ToolAnnotations(readOnlyHint=True, idempotentHint=True),
+)
+
+
+def build_state(turns: int) -> SessionState:
+    """A conversation of `turns` tool calls with cached results"""
+    state = SessionState()
+    screenshots = [
+        base64.b64encode(os.urandom(256 * 1024)).decode("ascii") for _ in range(4)
+    ]
+    state.messages.append({"role": "user", "content": "Investigate the build failures"})
+
+    for turn in range(turns):
+        tool_args = {"path": f"/logs/build-{turn}.txt", "lines": 200}
+        state.messages.append(
+            {
+                "role": "assistant",
+                "content": [
+                    {"type": "text", "text": f"Checking build {turn}."},
+                    {"type": "tool_use", "id": f"toolu_{turn}", "name": "read_file", "input": tool_args},
+                ],
+            }
+        )
+
+        if turn % 25 == 0:
+            # The same few screenshots come back again and again
+            screenshot = screenshots[turn // 25 % len(screenshots)]
+            result = [types.ImageContent(type="image", data=screenshot, mimeType="image/png")]
+            content = [
+                {
+                    "type": "image",
+                    "source": {
+                        "type": "base64",
+                        "media_type": "image/png",
+                        "data": screenshot,
+                    },
+                }
+            ]
+        else:
+            if turn % 10 == 0:
+                text = f"log line {turn}\n" * 4000
+            else:
+                text = f"Build {turn} passed in {turn % 90} seconds."
+            result = [types.TextContent(type="text", text=text)]
+            content = [{"type": "text", "text": text}]
+
+        state.messages.append(
+            {
+                "role": "user",
+                "content": [{"type": "tool_result", "tool_use_id": f"toolu_{turn}", "content": content}],
+            }
+        )
+        state.cache_result(READ_FILE, tool_args, result)
+
+    state.messages.append({"role": "assistant", "content": "All builds checked."})
+    return state
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def bench_json(state: SessionState, path: str) -> tuple[float, int, float]:
+    def save():
+        with open(path, "w") as f:
+            json.dump({"messages": state.messages, "tool_results": state.tool_results}, f)
+
+    def load():
+        with open(path) as f:
+            return json.load(f)
+
+    save_time, _ = timed(save)
+    load_time, _ = timed(load)
+    return save_time, os.path.getsize(path), load_time
+
+
+def bench_snapshot(state: SessionState, path: str) -> tuple[float, int, float, float]:
+    save_time, _ = timed(lambda: state.save(path))
+    load_time, restored = timed(lambda: SessionState.load(path))
+    first_use_time, _ = timed(
+        lambda: (materialize(restored.messages), materialize(restored.tool_results))
+    )
+    return save_time, os.path.getsize(path), load_time, first_use_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark session snapshots")
+    parser.add_argument("--turns", type=int, nargs="+", default=[100, 300, 1000])
+    args = parser.parse_args()
+
+    mib = 1024 * 1024
+    print(f"\n{'='*92}")
+    print("Session snapshots vs plain JSON")
+    print(f"{'='*92}")
+    print(
+        f"{'turns':>6} | {'save ms':>8}{'snapshot':>10} | {'size MiB':>9}{'snapshot':>10} | "
+        f"{'restore ms':>11}{'snapshot':>10} | {'first use ms':>13}"
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for turns in args.turns:
+            state = build_state(turns)
+            json_save, json_size, json_load = bench_json(state, os.path.join(tmp, "chat.json"))
+            snap_save, snap_size, snap_load, snap_first_use = bench_snapshot(
+                state, os.path.join(tmp, "chat.snap")
+            )
+            print(
+                f"{turns:>6} | {json_save * 1000:>8.1f}{snap_save * 1000:>10.1f} | "
+                f"{json_size / mib:>9.1f}{snap_size / mib:>10.1f} | "
+                f"{json_load * 1000:>11.1f}{snap_load * 1000:>10.1f} | "
+                f"{snap_first_use * 1000:>13.1f}"
+            )
+
+    print(f"{'='*92}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Binary tool results (images and blob resources)
+
+MCP returns images and blob resources as base64 strings. The Anthropic
+API also takes base64, so the string from the MCP response is reused
+as-is in the model request. It is never decoded and re-encoded per turn.
+Blobs are recognised by a hash of their base64 text, and their size is
+worked out from its length. Only an image that has to be downscaled is
+decoded (and, when max_image_dimension is set, the start of each image,
+to read its dimensions from the header).
+
+A blob that reappears in the same conversation is sent to Claude only
+once. Later copies become a short text reference. Blobs over the size
+limits are downscaled when Pillow is installed, or replaced with a
+placeholder otherwise.
+"""
+
+import base64
+import hashlib
+import io
+
+import mcp.types as types
+
+try:
+    from PIL import Image
+except ImportError:  # Downscaling is optional: pip install pillow
+    Image = None
+
+# Image formats Claude accepts
+SUPPORTED_IMAGE_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
+
+# Base64 characters decoded to read an image's dimensions (48 KiB of data)
+IMAGE_HEADER_CHARS = 64 * 1024
+
+
+class BlobLimits:
+    """Size limits for binary content sent to Claude"""
+
+    def __init__(
+        self,
+        max_blob_bytes: int = 5 * 1024 * 1024,
+        max_total_bytes: int = 20 * 1024 * 1024,
+        max_image_dimension: int | None = None,
+    ):
+        """
+        Args:
+            max_blob_bytes: Largest single image or PDF (decoded size) sent as-is
+            max_total_bytes: Budget for all unique images and PDFs in one conversation
+            max_image_dimension: Downscale images whose longest side is larger
+                (needs Pillow; None leaves dimensions alone)
+        """
+        self.max_blob_bytes = max_blob_bytes
+        self.max_total_bytes = max_total_bytes
+        self.max_image_dimension = max_image_dimension
+
+
+class Blob:
+    """One unique image or document already sent in the conversation"""
+
+    def __init__(self, media_type: str, digest: str, source: str, size: int):
+        self.media_type = media_type
+        self.digest = digest
+        self.source = source  # where it first appeared, for back-references
+        self.size = size  # decoded size in bytes
+
+
+class BlobStore:
+    """Deduplicates and size-limits binary content within one conversation"""
+
+    def __init__(self, limits: BlobLimits | None = None):
+        self.limits = limits or BlobLimits()
+        self.blobs: dict[str, Blob] = {}
+        self.total_bytes = 0
+        self.duplicates = 0
+
+    def copy(self) -> "BlobStore":
+        """Independent copy of the store (Blob objects are shared)"""
+        store = BlobStore(self.limits)
+        store.blobs = dict(self.blobs)
+        store.total_bytes = self.total_bytes
+        store.duplicates = self.duplicates
+        return store
+
+    def tool_result_content(self, content: list, tool_name: str) -> list[dict]:
+        """Convert MCP tool result content into Anthropic content blocks"""
+        blocks = []
+        for item in content:
+            if isinstance(item, types.TextContent):
+                blocks.append({"type": "text", "text": item.text})
+            elif isinstance(item, types.ImageContent):
+                blocks.append(self._blob_block(item.data, item.mimeType, tool_name))
+            elif isinstance(item, types.EmbeddedResource):
+                resource = item.resource
+                if isinstance(resource, types.TextResourceContents):
+                    blocks.append({"type": "text", "text": resource.text})
+                else:
+                    blocks.append(
+                        self._blob_block(
+                            resource.blob,
+                            resource.mimeType or "application/octet-stream",
+                            tool_name,
+                            uri=str(resource.uri),
+                        )
+                    )
+            elif isinstance(item, types.ResourceLink):
+                blocks.append({"type": "text", "text": f"[resource link: {item.uri}]"})
+            else:
+                blocks.append({"type": "text", "text": f"[{item.type} content omitted]"})
+        return blocks
+
+    def _blob_block(self, b64: str, media_type: str, tool_name: str, uri: str | None = None) -> dict:
+        label = f"{media_type} from {uri or tool_name}"
+        # Hash the base64 text so repeated blobs are recognised without decoding
+        digest = hashlib.sha256(b64.encode("ascii")).hexdigest()
+
+        seen = self.blobs.get(digest)
+        if seen is not None:
+            self.duplicates += 1
+            return _placeholder(
+                f"identical to the {seen.media_type} returned earlier by {seen.source}, "
+                f"ref {digest[:12]}"
+            )
+
+        size = _decoded_size(b64)
+
+        is_image = media_type in SUPPORTED_IMAGE_TYPES
+        if not is_image and media_type != "application/pdf":
+            # Claude only gets a description of other binary data, so it does
+            # not count against the size limits
+            return _placeholder(f"{label}, {_fmt_size(size)} of binary data, ref {digest[:12]}")
+
+        if is_image and self._needs_downscale(b64, size):
+            downscaled = self._downscale(b64)
+            if downscaled is None:
+                return _placeholder(f"{label} too large to send ({_fmt_size(size)})")
+            b64, size = downscaled
+        elif size > self.limits.max_blob_bytes:
+            return _placeholder(f"{label} too large to send ({_fmt_size(size)})")
+
+        if self.total_bytes + size > self.limits.max_total_bytes:
+            return _placeholder(f"{label} omitted: conversation size limit reached")
+
+        self.blobs[digest] = Blob(media_type, digest, uri or tool_name, size)
+        self.total_bytes += size
+
+        return {
+            "type": "image" if is_image else "document",
+            "source": {"type": "base64", "media_type": media_type, "data": b64},
+        }
+
+    def _needs_downscale(self, b64: str, size: int) -> bool:
+        if size > self.limits.max_blob_bytes:
+            return True
+        if self.limits.max_image_dimension is None or Image is None:
+            return False
+        # The header is at the start of the file, so decode just that first
+        # (and the whole image only if the header turns out to be longer)
+        for chunk in (b64[:IMAGE_HEADER_CHARS], b64):
+            try:
+                with Image.open(io.BytesIO(base64.b64decode(chunk))) as image:
+                    return max(image.size) > self.limits.max_image_dimension
+            except (OSError, ValueError):
+                continue
+        return False
+
+    def _downscale(self, b64: str) -> tuple[str, int] | None:
+        """Shrink an image to fit the limits; returns (base64, size) or None"""
+        if Image is None:
+            return None
+
+        try:
+            image = Image.open(io.BytesIO(base64.b64decode(b64)))
+        except (OSError, ValueError):
+            return None
+
+        with image:
+            image_format = image.format
+            width, height = image.size
+            scale = 1.0
+            if self.limits.max_image_dimension is not None:
+                scale = min(scale, self.limits.max_image_dimension / max(width, height))
+
+            # Shrink further until the encoded image fits, at most a few times
+            for _ in range(4):
+                size = (max(1, int(width * scale)), max(1, int(height * scale)))
+                buffer = io.BytesIO()
+                image.resize(size).save(buffer, format=image_format)
+                if buffer.tell() <= self.limits.max_blob_bytes:
+                    return base64.b64encode(buffer.getbuffer()).decode("ascii"), buffer.tell()
+                scale *= (self.limits.max_blob_bytes / buffer.tell()) ** 0.5 * 0.9
+
+        return None
+
+
+def _decoded_size(b64: str) -> int:
+    """Size of the data a base64 string decodes to, without decoding it"""
+    padding = 2 if b64.endswith("==") else 1 if b64.endswith("=") else 0
+    return len(b64) // 4 * 3 - padding
+
+
+def _placeholder(description: str) -> dict:
+    return {"type": "text", "text": f"[{description}]"}
+
+
+def _fmt_size(size: int) -> str:
+    if size >= 1024 * 1024:
+        return f"{size / 1024 / 1024:.1f} MiB"
+    return f"{size / 1024:.1f} KiB"
@@ -0,0 +1,233 @@
+"""
+Per-query budgets for the agentic loop
+
+A query gets a maximum number of model turns and a wall-clock deadline.
+The remaining time is passed down into every Claude request and every
+MCP tool call. When the budget runs out, the tool call in flight is
+cancelled over MCP (notifications/cancelled) and the loop asks Claude
+for a best-effort answer from what it has so far.
+
+Tool calls also forward the server's progress notifications to the
+caller, who can cancel an expensive call early.
+"""
+
+import asyncio
+import time
+from typing import Callable
+
+import mcp.types as types
+from anthropic import APIError
+from mcp import ClientSession
+
+DEFAULT_MAX_TURNS = 10
+DEFAULT_TIMEOUT_SECONDS = 120.0
+
+# Extra time allowed for the final answer once the budget is spent
+FINAL_ANSWER_GRACE_SECONDS = 15.0
+
+BUDGET_EXHAUSTED_NOTE = (
+    "The time or turn budget for this query is exhausted. "
+    "Answer now using only the information gathered so far, without calling more tools."
+)
+
+
+class BudgetExceeded(Exception):
+    """Raised when a query runs out of turns or time"""
+
+
+class ToolCallCancelled(Exception):
+    """Raised when the caller stops a tool call from its progress handler"""
+
+
+# Receives (progress, total, message); returning False cancels the tool call
+ProgressHandler = Callable[[float, float | None, str | None], bool | None]
+
+
+class QueryBudget:
+    """Turn and wall-clock limits for a single query"""
+
+    def __init__(
+        self,
+        max_turns: int = DEFAULT_MAX_TURNS,
+        timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+    ):
+        self.max_turns = max_turns
+        self.timeout_seconds = timeout_seconds
+        self.turns = 0
+        self.deadline = time.monotonic() + timeout_seconds
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (never negative)"""
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0 or self.turns >= self.max_turns
+
+    def next_turn(self) -> bool:
+        """Start another model turn. Returns False once the budget is spent."""
+        if self.expired():
+            return False
+        self.turns += 1
+        return True
+
+
+async def call_tool_with_deadline(
+    session: ClientSession,
+    tool_name: str,
+    tool_args: dict | None,
+    budget: QueryBudget,
+    on_progress: ProgressHandler | None = None,
+) -> types.CallToolResult:
+    """Call an MCP tool, cancelling it on the server if the deadline passes
+
+    Args:
+        session: Connected MCP session
+        tool_name: Tool to call
+        tool_args: Tool arguments
+        budget: Budget of the current query
+        on_progress: Called with (progress, total, message) for each progress
+            notification the server sends. Return False to cancel the call.
+
+    Raises:
+        BudgetExceeded: The deadline passed before or during the call
+        ToolCallCancelled: on_progress asked to stop the call
+    """
+    if budget.remaining() <= 0:
+        raise BudgetExceeded(f"No time left to call {tool_name}")
+
+    stop_requested = asyncio.Event()
+
+    async def forward_progress(progress: float, total: float | None, message: str | None):
+        if on_progress is not None and on_progress(progress, total, message) is False:
+            stop_requested.set()
+
+    # The server identifies the call by its JSON-RPC request id, which the SDK
+    # does not expose, so it is read from the session's counter. This happens
+    # inside the call's own task, right before call_tool: call_tool reaches
+    # send_request (which takes the id) without awaiting anything, so no
+    # other request can take this id in between.
+    request_ids: list[int] = []
+
+    async def send_call() -> types.CallToolResult:
+        request_ids.append(session._request_id)
+        return await session.call_tool(
+            tool_name, tool_args, progress_callback=forward_progress
+        )
+
+    async def cancel_on_server(reason: str):
+        # Nothing to cancel if the call was stopped before it was sent
+        if request_ids:
+            await _send_cancel(session, request_ids[0], reason)
+
+    call = asyncio.ensure_future(send_call())
+    stop = asyncio.ensure_future(stop_requested.wait())
+
+    try:
+        done, _ = await asyncio.wait(
+            {call, stop}, timeout=budget.remaining(), return_when=asyncio.FIRST_COMPLETED
+        )
+    except asyncio.CancelledError:
+        # The caller was cancelled (e.g. Ctrl-C); stop the server-side work too
+        call.cancel()
+        await asyncio.shield(cancel_on_server("Client cancelled"))
+        raise
+    finally:
+        stop.cancel()
+
+    if call in done:
+        return call.result()
+
+    await _abandon(call)
+    if stop in done:
+        await cancel_on_server("Cancelled by user")
+        raise ToolCallCancelled(f"{tool_name} was cancelled")
+
+    await cancel_on_server("Query deadline exceeded")
+    raise BudgetExceeded(f"Deadline passed while calling {tool_name}")
+
+
+async def _abandon(call: asyncio.Future):
+    """Cancel the local side of a tool call and wait for it to unwind"""
+    call.cancel()
+    try:
+        await call
+    except (asyncio.CancelledError, Exception):
+        pass
+
+
+async def _send_cancel(session: ClientSession, request_id: int, reason: str):
+    """Tell the server to stop working on an in-flight request"""
+    await session.send_notification(
+        types.ClientNotification(
+            types.CancelledNotification(
+                params=types.CancelledNotificationParams(
+                    requestId=request_id, reason=reason
+                )
+            )
+        )
+    )
+
+
+def cancelled_tool_result(
+    tool_use_id: str, reason: str = "the query budget was exhausted"
+) -> dict:
+    """Tool result block for a tool call that was cancelled or never run"""
+    return {
+        "type": "tool_result",
+        "tool_use_id": tool_use_id,
+        "content": f"Tool call cancelled: {reason}.",
+        "is_error": True,
+    }
+
+
+async def best_effort_answer(
+    call_model: Callable,
+    messages: list[dict],
+    tools: list[dict],
+    grace_seconds: float = FINAL_ANSWER_GRACE_SECONDS,
+) -> str:
+    """Ask Claude for a final answer without tools once the budget is spent
+
+    Args:
+        call_model: Coroutine function sending a messages.create request with
+            the model already chosen
+        messages: Conversation so far (the budget note is appended to it)
+        tools: Tool definitions used during the conversation
+        grace_seconds: Timeout for this final request
+
+    Falls back to any text Claude already produced if the request fails.
+    """
+    last = messages[-1]
+    if last["role"] == "user":
+        if isinstance(last["content"], str):
+            last["content"] = [{"type": "text", "text": last["content"]}]
+        last["content"].append({"type": "text", "text": BUDGET_EXHAUSTED_NOTE})
+    else:
+        messages.append({"role": "user", "content": BUDGET_EXHAUSTED_NOTE})
+
+    try:
+        # Tools stay declared (the history contains tool_use blocks) but are disabled
+        claude_response = await call_model(
+            max_tokens=1024,
+            messages=messages,
+            tools=tools,
+            tool_choice={"type": "none"},
+            timeout=grace_seconds,
+        )
+    except (APIError, TimeoutError):
+        return _text_so_far(messages) or "Stopped: the query budget ran out before an answer was ready."
+
+    messages.append({"role": "assistant", "content": claude_response.content})
+    return "".join(
+        block.text for block in claude_response.content if hasattr(block, "text")
+    )
+
+
+def _text_so_far(messages: list[dict]) -> str:
+    """Text from the most recent assistant message, if any"""
+    for message in reversed(messages):
+        if message["role"] == "assistant" and not isinstance(message["content"], str):
+            return "".join(
+                block.text for block in message["content"] if hasattr(block, "text")
+            )
+    return ""
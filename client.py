@@ -1,21 +1,49 @@
 import asyncio
-from typing import Optional
+import os
+import signal
+from functools import partial
+from typing import Callable, Optional
 from contextlib import AsyncExitStack
 
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 
-from anthropic import Anthropic
+from anthropic import APITimeoutError, AsyncAnthropic
 from dotenv import load_dotenv
 
+from budget import (
+    DEFAULT_MAX_TURNS,
+    DEFAULT_TIMEOUT_SECONDS,
+    BudgetExceeded,
+    QueryBudget,
+    ToolCallCancelled,
+    best_effort_answer,
+    call_tool_with_deadline,
+    cancelled_tool_result,
+)
+from binary_content import BlobLimits, BlobStore
+from routing import LARGE, ModelRouter
+from snapshots import SessionState, is_cacheable, materialize
+
 load_dotenv()  # load environment variables from .env
 
 class MCPClient:
-    def __init__(self):
+    def __init__(
+        self,
+        router: Optional[ModelRouter] = None,
+        blob_limits: Optional[BlobLimits] = None,
+    ):
         # Initialize session and client objects
         self.session: Optional[ClientSession] = None
+        self.server_name: Optional[str] = None
         self.exit_stack = AsyncExitStack()
-        self.anthropic = Anthropic()
+        self.anthropic = AsyncAnthropic()
+        # Routes tool-selection turns to a small model, final answers to a large one
+        self.router = router or ModelRouter()
+        # Size limits for images and other binary tool results
+        self.blob_limits = blob_limits or BlobLimits()
+        # Conversation and cached tool results that can be snapshotted to disk
+        self.state = SessionState(self.blob_limits)
 
     async def connect_to_server(self, server_script_path: str):
         """Connect to an MCP server
@@ -37,7 +65,8 @@ class MCPClient:
             ClientSession(self.stdio, self.write)
         )
 
-        await self.session.initialize()
+        init_result = await self.session.initialize()
+        self.server_name = init_result.serverInfo.name
 
         # List available tools
         response = await self.session.list_tools()
@@ -48,13 +77,40 @@ class MCPClient:
 
         return tools
 
-    async def process_query(self, query: str):
+    async def process_query(
+        self,
+        query: str,
+        max_turns: int = DEFAULT_MAX_TURNS,
+        timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+        on_progress: Optional[Callable] = None,
+        continue_conversation: bool = False,
+    ):
         """Process a query using Claude and available MCP tools
 
         Args:
             query: The user's question or request
+            max_turns: Maximum number of Claude turns before forcing an answer
+            timeout_seconds: Wall-clock budget for the whole query
+            on_progress: Called as on_progress(tool_name, progress, total, message)
+                for each progress update from a running tool (default: print it).
+                Return False to cancel that tool call.
+            continue_conversation: Continue the conversation in self.state
+                (its messages and the images already sent in it) and add
+                this exchange to it once the query finishes
         """
-        messages = [{"role": "user", "content": query}]
+        if on_progress is None:
+            on_progress = self.print_progress
+        budget = QueryBudget(max_turns=max_turns, timeout_seconds=timeout_seconds)
+        self.router.reset_stats()
+        # Binary tool results are deduplicated and size-limited per conversation.
+        # Like the messages, the blobs are only added to self.state if the
+        # query finishes (not when it is cancelled).
+        if continue_conversation:
+            history, blobs = self.state.messages, self.state.blobs.copy()
+        else:
+            history, blobs = [], BlobStore(self.blob_limits)
+        # Restored snapshots keep large payloads on disk until the first query
+        messages = materialize([*history, {"role": "user", "content": query}])
 
         # Get available tools from the MCP server
         response = await self.session.list_tools()
@@ -66,21 +122,34 @@ class MCPClient:
             }
             for tool in response.tools
         ]
+        tool_names = {tool["name"] for tool in available_tools}
+        cacheable = {tool.name: tool for tool in response.tools if is_cacheable(tool)}
+        # Cached results of tools that changed since they were cached are dropped
+        self.state.sync_tools(response.tools)
 
         print(f"\n{'='*60}")
         print(f"User Query: {query}")
         print(f"{'='*60}\n")
 
-        # Agentic loop - let Claude use tools as needed
-        while True:
-            # Call Claude with the current messages and available tools
-            # Use alias for latest version (or use "claude-sonnet-4-5-20250929" to pin a specific version)
-            claude_response = self.anthropic.messages.create(
-                model="claude-sonnet-4-5",
-                max_tokens=4096,
-                messages=messages,
-                tools=available_tools
-            )
+        # Agentic loop - let Claude use tools until it answers or the budget runs out
+        final_response = None
+        last_tools = []
+        while final_response is None and budget.next_turn():
+            # Call Claude with the current messages and available tools,
+            # on the small model unless this turn needs the large one
+            tier = self.router.tier_for_turn(self.server_name, last_tools)
+            try:
+                claude_response = await self.router.run_turn(
+                    self.anthropic,
+                    tier,
+                    tool_names,
+                    messages=messages,
+                    tools=available_tools,
+                    timeout=budget.remaining()
+                )
+            except (APITimeoutError, TimeoutError):
+                # Out of time for this query, retries included
+                break
 
             # Add Claude's response to messages
             messages.append({
@@ -92,22 +161,58 @@ class MCPClient:
             if claude_response.stop_reason == "tool_use":
                 # Process all tool calls
                 tool_results = []
+                last_tools = []
 
                 for content_block in claude_response.content:
                     if content_block.type == "tool_use":
                         tool_name = content_block.name
                         tool_args = content_block.input
+                        last_tools.append(tool_name)
 
                         print(f"🔧 Claude is using tool: {tool_name}")
                         print(f"   Arguments: {tool_args}\n")
 
-                        # Execute the tool via MCP
-                        result = await self.session.call_tool(tool_name, tool_args)
+                        # Reuse the result of an identical call to a cacheable tool
+                        cached = None
+                        if tool_name in cacheable:
+                            cached = self.state.cached_result(tool_name, tool_args)
+                        if cached is not None:
+                            print("   ♻️  Using cached result\n")
+                            tool_results.append({
+                                "type": "tool_result",
+                                "tool_use_id": content_block.id,
+                                "content": blobs.tool_result_content(cached, tool_name)
+                            })
+                            continue
+
+                        # Execute the tool via MCP, cancelling it if the deadline passes
+                        try:
+                            result = await call_tool_with_deadline(
+                                self.session,
+                                tool_name,
+                                tool_args,
+                                budget,
+                                on_progress=partial(on_progress, tool_name),
+                            )
+                        except BudgetExceeded:
+                            print(f"⏱  Cancelled {tool_name}: query budget exhausted\n")
+                            tool_results.append(cancelled_tool_result(content_block.id))
+                            continue
+                        except ToolCallCancelled:
+                            print(f"⏹  Cancelled {tool_name}\n")
+                            tool_results.append(
+                                cancelled_tool_result(content_block.id, "stopped by the user")
+                            )
+                            continue
+
+                        content = blobs.tool_result_content(result.content, tool_name)
+                        if tool_name in cacheable and not result.isError:
+                            self.state.cache_result(cacheable[tool_name], tool_args, result.content)
 
                         tool_results.append({
                             "type": "tool_result",
                             "tool_use_id": content_block.id,
-                            "content": result.content
+                            "content": content
                         })
 
                 # Add tool results to messages
@@ -116,27 +221,86 @@ class MCPClient:
                     "content": tool_results
                 })
 
-            elif claude_response.stop_reason == "end_turn":
+            else:
                 # Claude is done, extract the final response
                 final_response = ""
                 for content_block in claude_response.content:
                     if hasattr(content_block, "text"):
                         final_response += content_block.text
 
-                print(f"\n{'='*60}")
-                print(f"Claude's Response:")
-                print(f"{'='*60}")
-                print(final_response)
-                print(f"{'='*60}\n")
+        if final_response is None:
+            # Out of turns or time - ask for whatever answer Claude can give now
+            final_response = await best_effort_answer(
+                partial(self.router.call_model, self.anthropic, LARGE),
+                messages,
+                available_tools,
+            )
 
-                return final_response
+        history.extend(messages[len(history):])
+        if continue_conversation:
+            self.state.blobs = blobs
 
-    async def chat_loop(self):
-        """Interactive chat loop"""
+        print(f"\n{'='*60}")
+        print(f"Claude's Response:")
+        print(f"{'='*60}")
+        print(final_response)
+        print(f"{'='*60}")
+        print(self.router.report())
+        print()
+
+        return final_response
+
+    @staticmethod
+    def print_progress(
+        tool_name: str, progress: float, total: Optional[float], message: Optional[str]
+    ):
+        """Default progress handler: print each update as it arrives"""
+        amount = f"{100 * progress / total:.0f}%" if total else f"{progress:g}"
+        print(f"   ⏳ {tool_name} [{amount}] {message or ''}")
+
+    async def run_cancellable_query(self, query: str, **kwargs):
+        """Run a query where Ctrl-C stops it (and any tool call in flight) instead of exiting
+
+        Requests to Claude are async too, so Ctrl-C also interrupts a turn
+        that is still waiting for the model. Keyword arguments are passed
+        on to process_query.
+        """
+        loop = asyncio.get_running_loop()
+        task = asyncio.ensure_future(self.process_query(query, **kwargs))
+        try:
+            loop.add_signal_handler(signal.SIGINT, task.cancel)
+        except NotImplementedError:
+            # No loop signal handlers on Windows; Ctrl-C exits as before
+            return await task
+
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise
+            print("\n⏹  Query cancelled\n")
+        finally:
+            loop.remove_signal_handler(signal.SIGINT)
+
+    async def chat_loop(self, snapshot_path: Optional[str] = None):
+        """Interactive chat loop
+
+        Args:
+            snapshot_path: If given, the conversation carries over between
+                queries and is saved to this file after each one, so a
+                restarted chat resumes from it (including cached tool results)
+        """
         print("\n" + "="*60)
         print("MCP Client Started - Type your queries (or 'quit' to exit)")
         print("="*60 + "\n")
 
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.state = SessionState.load(snapshot_path, self.blob_limits)
+            print(
+                f"Resumed {len(self.state.messages)} messages and "
+                f"{self.state.cached_result_count} cached tool results from {snapshot_path}\n"
+            )
+
         while True:
             try:
                 query = input("You: ").strip()
@@ -148,7 +312,11 @@ class MCPClient:
                 if not query:
                     continue
 
-                await self.process_query(query)
+                if snapshot_path:
+                    await self.run_cancellable_query(query, continue_conversation=True)
+                    self.state.save(snapshot_path)
+                else:
+                    await self.run_cancellable_query(query)
 
             except KeyboardInterrupt:
                 print("\n\nGoodbye!")
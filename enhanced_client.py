@@ -1,23 +1,59 @@
 import asyncio
-from typing import Optional
-from contextlib import AsyncExitStack
+import os
+import signal
+from functools import partial
+from typing import Callable, Optional
+from contextlib import AsyncExitStack, asynccontextmanager
 
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 
-from anthropic import Anthropic
+from anthropic import APITimeoutError, AsyncAnthropic
 from dotenv import load_dotenv
 
+from budget import (
+    DEFAULT_MAX_TURNS,
+    DEFAULT_TIMEOUT_SECONDS,
+    BudgetExceeded,
+    QueryBudget,
+    ToolCallCancelled,
+    best_effort_answer,
+    call_tool_with_deadline,
+    cancelled_tool_result,
+)
+from binary_content import BlobLimits, BlobStore
+from lazy_servers import LazyServerPool, ServerStartError
+from routing import LARGE, SMALL, ModelRouter
+from snapshots import SessionState, is_cacheable, materialize
+
 load_dotenv()
 
 
 class EnhancedMCPClient:
     """Enhanced MCP Client that supports both Python and Node.js servers"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        router: Optional[ModelRouter] = None,
+        blob_limits: Optional[BlobLimits] = None,
+        lazy_servers: Optional[LazyServerPool] = None,
+    ):
+        """
+        Args:
+            router: Model routing policy (default: small model for tool
+                selection, large model for final answers)
+            blob_limits: Size limits for images and other binary tool results
+            lazy_servers: Pool for servers added with register_server (e.g. to
+                change the idle timeout or manifest cache directory)
+        """
         self.session: Optional[ClientSession] = None
+        self.server_name: Optional[str] = None
         self.exit_stack = AsyncExitStack()
-        self.anthropic = Anthropic()
+        self.anthropic = AsyncAnthropic()
+        self.router = router or ModelRouter()
+        self.blob_limits = blob_limits or BlobLimits()
+        self.lazy_servers = lazy_servers or LazyServerPool()
+        self.state = SessionState(self.blob_limits)
 
     async def connect_to_server(
         self, command: str, args: list[str] = None, env: dict = None
@@ -42,7 +78,8 @@ class EnhancedMCPClient:
             ClientSession(self.stdio, self.write)
         )
 
-        await self.session.initialize()
+        init_result = await self.session.initialize()
+        self.server_name = init_result.serverInfo.name
 
         # List available tools
         response = await self.session.list_tools()
@@ -53,6 +90,32 @@ class EnhancedMCPClient:
 
         return tools
 
+    async def register_server(
+        self, name: str, command: str, args: list[str] = None, env: dict = None
+    ):
+        """Register an MCP server that only starts when one of its tools is called
+
+        Its tools are advertised from a cached manifest, and the process
+        shuts down again after the pool's idle timeout. Tools of registered
+        servers take precedence over the connected server's tools.
+
+        Raises:
+            ServerStartError: The server has no cached manifest and could
+                not be started to fetch one
+
+        Args:
+            name: Name for the server (also used for its manifest cache file)
+            command: The command to run (e.g., "python", "node", "npx")
+            args: List of arguments
+            env: Optional environment variables
+        """
+        tools = await self.lazy_servers.register(name, command, args, env)
+        print(f"\nRegistered server '{name}' with {len(tools)} tools (starts on first use):")
+        for tool in tools:
+            print(f"  - {tool.name}: {tool.description}")
+
+        return tools
+
     async def connect_to_python_server(self, script_path: str):
         """Helper: Connect to a Python MCP server"""
         return await self.connect_to_server("python", [script_path])
@@ -66,77 +129,289 @@ class EnhancedMCPClient:
         """
         return await self.connect_to_server("npx", [package, *args])
 
-    async def process_query(self, query: str):
-        """Process a query using Claude and available MCP tools"""
-        messages = [{"role": "user", "content": query}]
+    async def process_query(
+        self,
+        query: str,
+        max_turns: int = DEFAULT_MAX_TURNS,
+        timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+        on_progress: Optional[Callable] = None,
+        continue_conversation: bool = False,
+    ):
+        """Process a query using Claude and available MCP tools
 
-        response = await self.session.list_tools()
+        Args:
+            query: The user's question or request
+            max_turns: Maximum number of Claude turns before forcing an answer
+            timeout_seconds: Wall-clock budget for the whole query
+            on_progress: Called as on_progress(tool_name, progress, total, message)
+                for each progress update from a running tool (default: print it).
+                Return False to cancel that tool call.
+            continue_conversation: Continue the conversation in self.state
+                (its messages and the images already sent in it) and add
+                this exchange to it once the query finishes
+        """
+        if on_progress is None:
+            on_progress = self.print_progress
+        budget = QueryBudget(max_turns=max_turns, timeout_seconds=timeout_seconds)
+        self.router.reset_stats()
+        # Binary tool results are deduplicated and size-limited per conversation.
+        # Like the messages, the blobs are only added to self.state if the
+        # query finishes (not when it is cancelled).
+        if continue_conversation:
+            history, blobs = self.state.messages, self.state.blobs.copy()
+        else:
+            history, blobs = [], BlobStore(self.blob_limits)
+        # Restored snapshots keep large payloads on disk until the first query
+        messages = materialize([*history, {"role": "user", "content": query}])
+
+        # Claude rejects duplicate tool names, so each name is offered once.
+        # Registered servers' tools take precedence over the connected server's.
+        tools_by_name = {tool.name: tool for tool in self.lazy_servers.list_tools()}
+        if self.session is not None:
+            response = await self.session.list_tools()
+            for tool in response.tools:
+                tools_by_name.setdefault(tool.name, tool)
+        tools = list(tools_by_name.values())
         available_tools = [
             {
                 "name": tool.name,
                 "description": tool.description,
                 "input_schema": tool.inputSchema,
             }
-            for tool in response.tools
+            for tool in tools
         ]
+        tool_names = {tool["name"] for tool in available_tools}
+        cacheable = {tool.name: tool for tool in tools if is_cacheable(tool)}
+        # Cached results of tools that changed since they were cached are dropped
+        self.state.sync_tools(tools)
 
         print(f"\n{'='*60}")
         print(f"User Query: {query}")
         print(f"{'='*60}\n")
 
-        while True:
-            claude_response = self.anthropic.messages.create(
-                model="claude-sonnet-4-5",
-                max_tokens=4096,
-                messages=messages,
-                tools=available_tools,
-            )
+        final_response = None
+        last_tools = []
+        while final_response is None and budget.next_turn():
+            tier = self._tier_for_turn(last_tools)
+            try:
+                claude_response = await self.router.run_turn(
+                    self.anthropic,
+                    tier,
+                    tool_names,
+                    messages=messages,
+                    tools=available_tools,
+                    timeout=budget.remaining(),
+                )
+            except (APITimeoutError, TimeoutError):
+                # Out of time for this query, retries included
+                break
 
             messages.append({"role": "assistant", "content": claude_response.content})
 
             if claude_response.stop_reason == "tool_use":
                 tool_results = []
+                last_tools = []
 
                 for content_block in claude_response.content:
                     if content_block.type == "tool_use":
                         tool_name = content_block.name
                         tool_args = content_block.input
+                        last_tools.append(tool_name)
 
                         print(f"🔧 Claude is using tool: {tool_name}")
                         print(f"   Arguments: {tool_args}\n")
 
-                        result = await self.session.call_tool(tool_name, tool_args)
+                        if tool_name not in tool_names:
+                            tool_results.append(
+                                {
+                                    "type": "tool_result",
+                                    "tool_use_id": content_block.id,
+                                    "content": f"Unknown tool: {tool_name}",
+                                    "is_error": True,
+                                }
+                            )
+                            continue
+
+                        cached = None
+                        if tool_name in cacheable:
+                            cached = self.state.cached_result(tool_name, tool_args)
+                        if cached is not None:
+                            print("   ♻️  Using cached result\n")
+                            tool_results.append(
+                                {
+                                    "type": "tool_result",
+                                    "tool_use_id": content_block.id,
+                                    "content": blobs.tool_result_content(cached, tool_name),
+                                }
+                            )
+                            continue
+
+                        try:
+                            async with self._session_for(tool_name, budget) as session:
+                                result = await call_tool_with_deadline(
+                                    session,
+                                    tool_name,
+                                    tool_args,
+                                    budget,
+                                    on_progress=partial(on_progress, tool_name),
+                                )
+                        except BudgetExceeded:
+                            print(f"⏱  Cancelled {tool_name}: query budget exhausted\n")
+                            tool_results.append(cancelled_tool_result(content_block.id))
+                            continue
+                        except ToolCallCancelled:
+                            print(f"⏹  Cancelled {tool_name}\n")
+                            tool_results.append(
+                                cancelled_tool_result(content_block.id, "stopped by the user")
+                            )
+                            continue
+                        except ServerStartError as e:
+                            print(f"❌ {e}\n")
+                            tool_results.append(
+                                {
+                                    "type": "tool_result",
+                                    "tool_use_id": content_block.id,
+                                    "content": str(e),
+                                    "is_error": True,
+                                }
+                            )
+                            continue
+
+                        content = blobs.tool_result_content(result.content, tool_name)
+                        if tool_name in cacheable and not result.isError:
+                            self.state.cache_result(cacheable[tool_name], tool_args, result.content)
 
                         tool_results.append(
                             {
                                 "type": "tool_result",
                                 "tool_use_id": content_block.id,
-                                "content": result.content,
+                                "content": content,
                             }
                         )
 
                 messages.append({"role": "user", "content": tool_results})
 
-            elif claude_response.stop_reason == "end_turn":
+            else:
                 final_response = ""
                 for content_block in claude_response.content:
                     if hasattr(content_block, "text"):
                         final_response += content_block.text
 
-                print(f"\n{'='*60}")
-                print(f"Claude's Response:")
-                print(f"{'='*60}")
-                print(final_response)
-                print(f"{'='*60}\n")
+        if final_response is None:
+            final_response = await best_effort_answer(
+                partial(self.router.call_model, self.anthropic, LARGE),
+                messages,
+                available_tools,
+            )
+
+        history.extend(messages[len(history):])
+        if continue_conversation:
+            self.state.blobs = blobs
+
+        print(f"\n{'='*60}")
+        print(f"Claude's Response:")
+        print(f"{'='*60}")
+        print(final_response)
+        print(f"{'='*60}")
+        print(self.router.report())
+        print()
+
+        return final_response
+
+    def _tier_for_turn(self, last_tools: list[str]) -> str:
+        """Model tier for the next turn
+
+        The router's server_tiers apply to the servers that ran the last
+        tools (registered servers by their register_server name), or to the
+        connected server before any tool has run. If any of them asks for
+        the large tier, it is used.
+        """
+        servers = {self._server_name_for(tool_name) for tool_name in last_tools}
+        tiers = {
+            self.router.tier_for_turn(server, last_tools)
+            for server in servers or {self.server_name}
+        }
+        return LARGE if LARGE in tiers else SMALL
+
+    def _server_name_for(self, tool_name: str) -> Optional[str]:
+        owner = self.lazy_servers.owner(tool_name)
+        return owner.name if owner is not None else self.server_name
+
+    @asynccontextmanager
+    async def _session_for(self, tool_name: str, budget: QueryBudget):
+        """Session serving a tool, starting its registered server if needed
+
+        Starting the server counts against the query budget: BudgetExceeded
+        if the deadline passes first, ServerStartError if the start fails.
+        """
+        if self.lazy_servers.owner(tool_name) is None:
+            yield self.session
+            return
+
+        async with AsyncExitStack() as stack:
+            try:
+                session = await stack.enter_async_context(
+                    self.lazy_servers.session_for(
+                        tool_name, startup_timeout=budget.remaining()
+                    )
+                )
+            except TimeoutError:
+                raise BudgetExceeded(
+                    f"Deadline passed while starting the server for {tool_name}"
+                )
+            yield session
+
+    @staticmethod
+    def print_progress(
+        tool_name: str, progress: float, total: Optional[float], message: Optional[str]
+    ):
+        """Default progress handler: print each update as it arrives"""
+        amount = f"{100 * progress / total:.0f}%" if total else f"{progress:g}"
+        print(f"   ⏳ {tool_name} [{amount}] {message or ''}")
+
+    async def run_cancellable_query(self, query: str, **kwargs):
+        """Run a query where Ctrl-C stops it (and any tool call in flight) instead of exiting
 
-                return final_response
+        Requests to Claude are async too, so Ctrl-C also interrupts a turn
+        that is still waiting for the model. Keyword arguments are passed
+        on to process_query.
+        """
+        loop = asyncio.get_running_loop()
+        task = asyncio.ensure_future(self.process_query(query, **kwargs))
+        try:
+            loop.add_signal_handler(signal.SIGINT, task.cancel)
+        except NotImplementedError:
+            # No loop signal handlers on Windows; Ctrl-C exits as before
+            return await task
+
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise
+            print("\n⏹  Query cancelled\n")
+        finally:
+            loop.remove_signal_handler(signal.SIGINT)
+
+    async def chat_loop(self, snapshot_path: Optional[str] = None):
+        """Interactive chat loop
 
-    async def chat_loop(self):
-        """Interactive chat loop"""
+        Args:
+            snapshot_path: If given, the conversation carries over between
+                queries and is saved to this file after each one, so a
+                restarted chat resumes from it (including cached tool results)
+        """
         print("\n" + "=" * 60)
         print("MCP Client Started - Type your queries (or 'quit' to exit)")
         print("=" * 60 + "\n")
 
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.state = SessionState.load(snapshot_path, self.blob_limits)
+            print(
+                f"Resumed {len(self.state.messages)} messages and "
+                f"{self.state.cached_result_count} cached tool results from {snapshot_path}\n"
+            )
+
         while True:
             try:
                 query = input("You: ").strip()
@@ -148,7 +423,11 @@ class EnhancedMCPClient:
                 if not query:
                     continue
 
-                await self.process_query(query)
+                if snapshot_path:
+                    await self.run_cancellable_query(query, continue_conversation=True)
+                    self.state.save(snapshot_path)
+                else:
+                    await self.run_cancellable_query(query)
 
             except KeyboardInterrupt:
                 print("\n\nGoodbye!")
@@ -156,4 +435,5 @@ class EnhancedMCPClient:
 
     async def cleanup(self):
         """Clean up resources"""
+        await self.lazy_servers.aclose()
         await self.exit_stack.aclose()
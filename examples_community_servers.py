@@ -6,7 +6,9 @@ that provide useful tools for different tasks.
 """
 
 import asyncio
+import os
 from client import MCPClient
+from enhanced_client import EnhancedMCPClient
 
 
 async def example_filesystem_server():
@@ -160,13 +162,33 @@ async def example_google_drive_server():
 
 async def example_multiple_servers():
     """
-    Connect to multiple MCP servers simultaneously
+    Use several MCP servers from one client
 
-    This requires extending the MCPClient class to handle multiple sessions.
-    See the documentation for implementing multi-server support.
+    Servers are registered instead of connected: their tools are offered
+    to Claude from a cached manifest, and each server process only starts
+    when Claude calls one of its tools. Idle servers shut down again after
+    a few minutes, so configuring many servers costs almost nothing.
+
+    The first run starts each server once to cache its tool list.
     """
-    # TODO: Implement multi-server client
-    pass
+    client = EnhancedMCPClient()
+
+    try:
+        await client.register_server("calculator", "python", ["simple_server.py"])
+        await client.register_server(
+            "filesystem", "npx", ["@modelcontextprotocol/server-filesystem", os.getcwd()]
+        )
+        await client.register_server(
+            "github", "npx", ["@modelcontextprotocol/server-github"]
+        )
+
+        # Example query: "Add 2 and 3" (starts only the calculator server)
+        # Example query: "How many Python files are in this directory?"
+
+        await client.chat_loop()
+
+    finally:
+        await client.cleanup()
 
 
 # Example usage
@@ -178,6 +200,7 @@ if __name__ == "__main__":
     print("3. PostgreSQL Server - Database queries")
     print("4. Slack Server - Slack messaging")
     print("5. Google Drive Server - Document access")
+    print("6. Multiple Servers - Started on demand")
     print("\nEdit this file and uncomment the example you want to try!")
     print("\nNote: Make sure to install the required servers first:")
     print("  npm install -g @modelcontextprotocol/server-<name>")
@@ -186,3 +209,4 @@ if __name__ == "__main__":
     # asyncio.run(example_filesystem_server())
     # asyncio.run(example_github_server())
     # asyncio.run(example_postgres_server())
+    # asyncio.run(example_multiple_servers())
@@ -0,0 +1,283 @@
+"""
+Lazy, on-demand MCP servers
+
+Servers are registered with a tool manifest (the result of list_tools)
+cached on disk, so their tools can be offered to Claude straight away.
+A server's process is only started on the first call_tool that targets
+it, and is shut down again after it has been idle for a while.
+
+A server that has no cached manifest yet is started once at
+registration to fetch one, and stopped again straight away. The
+manifest is refreshed every time the server really starts.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import mcp.types as types
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+DEFAULT_IDLE_TIMEOUT_SECONDS = 300.0
+DEFAULT_MANIFEST_DIR = os.path.join(os.path.expanduser("~"), ".cache", "mcp-client", "manifests")
+
+
+class ServerStartError(Exception):
+    """Raised when a registered server's process cannot be started"""
+
+
+class LazyServer:
+    """One server definition whose process runs only while it is in use"""
+
+    def __init__(
+        self,
+        name: str,
+        command: str,
+        args: list[str] | None = None,
+        env: dict | None = None,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT_SECONDS,
+        manifest_dir: str = DEFAULT_MANIFEST_DIR,
+    ):
+        self.name = name
+        self.params = StdioServerParameters(command=command, args=args or [], env=env)
+        self.idle_timeout = idle_timeout
+        self.tools: list[types.Tool] = []
+        self.session: Optional[ClientSession] = None
+        self.starts = 0
+
+        key = hashlib.sha256(json.dumps([command, args or []]).encode()).hexdigest()[:16]
+        self.manifest_path = os.path.join(manifest_dir, f"{name}-{key}.json")
+
+        self._runner: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+        self._stop_requested = asyncio.Event()
+        self._startup_error: Optional[BaseException] = None
+        self._stopping = False
+        self._in_flight = 0
+        self._last_used = time.monotonic()
+
+    @property
+    def running(self) -> bool:
+        return self._runner is not None and not self._runner.done()
+
+    @property
+    def stopping(self) -> bool:
+        """The process is shutting down; new calls wait and then restart it"""
+        return self.running and self._stopping
+
+    def load_manifest(self) -> bool:
+        """Load the cached tool list; returns False if there is none"""
+        try:
+            with open(self.manifest_path) as f:
+                self.tools = [types.Tool.model_validate(tool) for tool in json.load(f)]
+        except (OSError, ValueError):
+            return False
+        return True
+
+    def _save_manifest(self):
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        with open(self.manifest_path, "w") as f:
+            json.dump([tool.model_dump(mode="json", exclude_none=True) for tool in self.tools], f)
+
+    @asynccontextmanager
+    async def use(self, startup_timeout: float | None = None) -> AsyncIterator[ClientSession]:
+        """Session for one request, starting the server if it is not running
+
+        Args:
+            startup_timeout: Seconds to wait for the server to be ready
+                (TimeoutError after that; the start itself carries on)
+
+        Raises:
+            ServerStartError: The server could not be started
+        """
+        # Counted before any await so the idle check never stops a server in use
+        self._in_flight += 1
+        try:
+            yield await asyncio.wait_for(self._ensure_started(), startup_timeout)
+        finally:
+            self._in_flight -= 1
+            self._last_used = time.monotonic()
+
+    async def _ensure_started(self) -> ClientSession:
+        if self.stopping:
+            # Its session is closing; let the old process go first (without
+            # cancelling the shutdown if this call gives up waiting)
+            await asyncio.wait({self._runner})
+
+        if not self.running:
+            self._ready.clear()
+            self._stop_requested.clear()
+            self._startup_error = None
+            self._stopping = False
+            self._runner = asyncio.create_task(self._run())
+
+        await self._ready.wait()
+        if self._startup_error is not None:
+            error = self._startup_error
+            # stdio_client and ClientSession wrap errors in task group exceptions
+            while isinstance(error, ExceptionGroup) and len(error.exceptions) == 1:
+                error = error.exceptions[0]
+            raise ServerStartError(
+                f"Could not start server '{self.name}' ({self.params.command}): {error}"
+            ) from self._startup_error
+        return self.session
+
+    async def _run(self):
+        """Own the server process: start it, wait until idle, shut it down
+
+        The stdio and session contexts must be entered and exited in the
+        same task, so the whole lifetime of the process lives here.
+        """
+        try:
+            async with AsyncExitStack() as exit_stack:
+                stdio, write = await exit_stack.enter_async_context(stdio_client(self.params))
+                session = await exit_stack.enter_async_context(ClientSession(stdio, write))
+                await session.initialize()
+
+                response = await session.list_tools()
+                self.tools = response.tools
+                self._save_manifest()
+
+                self.starts += 1
+                self.session = session
+                self._last_used = time.monotonic()
+                self._ready.set()
+
+                await self._wait_until_idle()
+
+                # From here on the session is being closed: calls that come
+                # in now must not get it, but wait for a new process instead
+                self._stopping = True
+                self._ready.clear()
+                self.session = None
+        except Exception as e:
+            self._startup_error = e
+        finally:
+            self.session = None
+            # Wake anyone waiting on a start that failed
+            self._ready.set()
+
+    async def _wait_until_idle(self):
+        while not self._stop_requested.is_set():
+            idle_for = time.monotonic() - self._last_used
+            if self._in_flight == 0 and idle_for >= self.idle_timeout:
+                return
+            wait = self.idle_timeout - idle_for if self._in_flight == 0 else self.idle_timeout
+            try:
+                await asyncio.wait_for(self._stop_requested.wait(), timeout=max(wait, 0.01))
+            except TimeoutError:
+                pass
+
+    async def stop(self):
+        """Shut the server process down now (it restarts on the next call)"""
+        if self.running:
+            self._stop_requested.set()
+            if not self._ready.is_set() and not self._stopping:
+                # Still starting up (e.g. after a call gave up waiting for it)
+                self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    raise
+
+
+class LazyServerPool:
+    """Registered servers and which server owns each tool"""
+
+    def __init__(
+        self,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT_SECONDS,
+        manifest_dir: str = DEFAULT_MANIFEST_DIR,
+    ):
+        self.idle_timeout = idle_timeout
+        self.manifest_dir = manifest_dir
+        self.servers: dict[str, LazyServer] = {}
+        self._tool_owners: dict[str, LazyServer] = {}
+        self._tools: dict[str, types.Tool] = {}
+
+    async def register(
+        self,
+        name: str,
+        command: str,
+        args: list[str] | None = None,
+        env: dict | None = None,
+        idle_timeout: float | None = None,
+    ) -> list[types.Tool]:
+        """Register a server and return its tools
+
+        Uses the cached manifest if there is one, without starting the
+        server. Otherwise the server is started once to list its tools
+        and stopped again. Registering a name again replaces (and stops)
+        the server registered under it.
+
+        Raises:
+            ServerStartError: There is no manifest and the server could not
+                be started (the server is not registered)
+        """
+        server = LazyServer(
+            name,
+            command,
+            args,
+            env,
+            idle_timeout=self.idle_timeout if idle_timeout is None else idle_timeout,
+            manifest_dir=self.manifest_dir,
+        )
+
+        if not server.load_manifest():
+            try:
+                async with server.use():
+                    pass
+            finally:
+                await server.stop()
+
+        previous = self.servers.get(name)
+        if previous is not None:
+            # Replaced: its process would otherwise be left running
+            await previous.stop()
+        self.servers[name] = server
+        self._index_tools()
+        return server.tools
+
+    def _index_tools(self):
+        # The first server registered wins when two servers share a tool name
+        self._tool_owners = {}
+        self._tools = {}
+        for server in self.servers.values():
+            for tool in server.tools:
+                if tool.name not in self._tools:
+                    self._tool_owners[tool.name] = server
+                    self._tools[tool.name] = tool
+
+    def list_tools(self) -> list[types.Tool]:
+        """Tools of every registered server, without starting any of them
+
+        Each tool name appears once, for the server that owns it.
+        """
+        return list(self._tools.values())
+
+    def owner(self, tool_name: str) -> Optional[LazyServer]:
+        return self._tool_owners.get(tool_name)
+
+    @asynccontextmanager
+    async def session_for(
+        self, tool_name: str, startup_timeout: float | None = None
+    ) -> AsyncIterator[ClientSession]:
+        """Session of the server that owns the tool, starting it if needed
+
+        See LazyServer.use for startup_timeout and the errors raised.
+        """
+        server = self._tool_owners[tool_name]
+        async with server.use(startup_timeout) as session:
+            yield session
+        # A real start may have changed the tool list
+        self._index_tools()
+
+    async def aclose(self):
+        """Stop every running server"""
+        await asyncio.gather(*(server.stop() for server in self.servers.values()))
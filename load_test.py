@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Load test for MCP servers
+
+Opens several sessions to a local MCP server and drives a mix of
+list_tools and call_tool requests, either at a fixed concurrency
+(closed loop) or at a fixed arrival rate (open loop). Reports
+throughput, latency percentiles, error rates, and the CPU time and
+memory (RSS) used by the server processes.
+
+Everything runs locally over stdio, the same way EnhancedMCPClient
+starts servers. Server CPU and RSS are read from /proc, so they are
+only reported on Linux.
+
+Examples:
+    python load_test.py
+    python load_test.py --sessions 8 --concurrency 64 --duration 20
+    python load_test.py --rate 500 --mix call_tool=0.8,list_tools=0.2
+    python load_test.py --tool greet --args '{"name": "Alice"}'
+    python load_test.py --command npx --server-args @modelcontextprotocol/server-filesystem /tmp \\
+        --tool list_directory --args '{"path": "/tmp"}'
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from contextlib import AsyncExitStack
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+
+class Stats:
+    """Latencies and errors for one operation type"""
+
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.errors = 0
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class ServerMonitor:
+    """Samples CPU time and RSS of the server processes via /proc"""
+
+    def __init__(self, interval: float = 0.25):
+        self.interval = interval
+        self.available = os.path.isdir("/proc")
+        self.peak_rss = 0
+        self.cpu_start = 0.0
+        self.cpu_end = 0.0
+        self._task: asyncio.Task | None = None
+
+    def _server_pids(self) -> list[int]:
+        """All descendants of this process (servers and anything they spawn)"""
+        children: dict[int, list[int]] = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            stat = self._read_stat(int(entry))
+            if stat:
+                children.setdefault(int(stat[1]), []).append(int(entry))
+
+        pids, stack = [], [os.getpid()]
+        while stack:
+            for child in children.get(stack.pop(), []):
+                pids.append(child)
+                stack.append(child)
+        return pids
+
+    @staticmethod
+    def _read_stat(pid: int) -> list[str] | None:
+        """Fields of /proc/<pid>/stat after the command name, or None if gone"""
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                data = f.read()
+        except OSError:
+            return None
+        # The command name is in parentheses and may contain spaces
+        return data[data.rindex(")") + 2 :].split()
+
+    def _cpu_seconds(self) -> float:
+        ticks = os.sysconf("SC_CLK_TCK")
+        total = 0
+        for pid in self._server_pids():
+            stat = self._read_stat(pid)
+            if stat:
+                # utime and stime are fields 14 and 15 of /proc/<pid>/stat
+                total += int(stat[11]) + int(stat[12])
+        return total / ticks
+
+    def rss_bytes(self) -> int:
+        """Current RSS of all server processes"""
+        page_size = os.sysconf("SC_PAGE_SIZE")
+        total = 0
+        for pid in self._server_pids():
+            try:
+                with open(f"/proc/{pid}/statm") as f:
+                    total += int(f.read().split()[1]) * page_size
+            except OSError:
+                pass
+        return total
+
+    async def _sample(self):
+        while True:
+            self.peak_rss = max(self.peak_rss, self.rss_bytes())
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if not self.available:
+            return
+        self.cpu_start = self._cpu_seconds()
+        self._task = asyncio.create_task(self._sample())
+
+    async def stop(self):
+        if not self.available:
+            return
+        self.cpu_end = self._cpu_seconds()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    """Parse "call_tool=0.9,list_tools=0.1" into normalised weights"""
+    weights = {}
+    for part in mix.split(","):
+        op, _, weight = part.partition("=")
+        op = op.strip()
+        if op not in ("call_tool", "list_tools"):
+            raise ValueError(f"Unknown operation in mix: {op}")
+        weights[op] = float(weight or 1)
+    total = sum(weights.values())
+    return {op: weight / total for op, weight in weights.items()}
+
+
+async def open_sessions(
+    exit_stack: AsyncExitStack, command: str, args: list[str], count: int
+) -> list[ClientSession]:
+    """Start `count` server processes and initialize a session with each"""
+
+    async def open_one() -> ClientSession:
+        server_params = StdioServerParameters(command=command, args=args, env=None)
+        stdio, write = await exit_stack.enter_async_context(stdio_client(server_params))
+        session = await exit_stack.enter_async_context(ClientSession(stdio, write))
+        await session.initialize()
+        return session
+
+    # Sessions are opened one at a time: the exit stack is not safe to share
+    # between concurrently entered contexts.
+    return [await open_one() for _ in range(count)]
+
+
+async def run_request(
+    session: ClientSession,
+    op: str,
+    tool: str,
+    tool_args: dict,
+    stats: dict[str, Stats],
+    scheduled: float | None = None,
+):
+    """Issue one request and record its latency or error
+
+    In open-loop mode latency is measured from the time the request was
+    scheduled, not from when it actually started: if the client falls
+    behind the schedule, that delay is part of what a user would see
+    (otherwise it hides as coordinated omission).
+    """
+    start = time.perf_counter() if scheduled is None else scheduled
+    try:
+        if op == "list_tools":
+            await session.list_tools()
+            failed = False
+        else:
+            result = await session.call_tool(tool, tool_args)
+            failed = result.isError
+    except Exception:
+        failed = True
+
+    if failed:
+        stats[op].errors += 1
+    else:
+        stats[op].latencies.append(time.perf_counter() - start)
+
+
+async def closed_loop(sessions, ops, weights, tool, tool_args, stats, concurrency, duration):
+    """`concurrency` workers, each sending the next request as soon as the last finishes"""
+    end = time.perf_counter() + duration
+
+    async def worker(index: int):
+        session = sessions[index % len(sessions)]
+        while time.perf_counter() < end:
+            op = random.choices(ops, weights)[0]
+            await run_request(session, op, tool, tool_args, stats)
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+
+
+async def open_loop(sessions, ops, weights, tool, tool_args, stats, rate, duration) -> float:
+    """Start requests on a fixed schedule of `rate` per second, regardless of responses
+
+    Returns how far (in seconds) the client fell behind the schedule at worst.
+    """
+    start = time.perf_counter()
+    total = int(rate * duration)
+    pending = set()
+    max_lag = 0.0
+
+    for i in range(total):
+        scheduled = start + i / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        max_lag = max(max_lag, time.perf_counter() - scheduled)
+        op = random.choices(ops, weights)[0]
+        task = asyncio.create_task(
+            run_request(sessions[i % len(sessions)], op, tool, tool_args, stats, scheduled)
+        )
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+    if pending:
+        await asyncio.gather(*pending)
+    return max_lag
+
+
+def print_report(
+    stats: dict[str, Stats],
+    elapsed: float,
+    monitor: ServerMonitor,
+    client_cpu: float,
+    max_lag: float | None,
+    args,
+):
+    print(f"\n{'='*60}")
+    print("Load Test Results")
+    print(f"{'='*60}")
+    print(f"Server:      {args.command} {' '.join(args.server_args)}")
+    mode = f"rate {args.rate}/s" if args.rate else f"concurrency {args.concurrency}"
+    print(f"Mode:        {mode}, {args.sessions} sessions, {elapsed:.1f}s")
+
+    total_ok = sum(len(s.latencies) for s in stats.values())
+    total_err = sum(s.errors for s in stats.values())
+    print(f"Throughput:  {total_ok / elapsed:.1f} req/s ({total_ok} ok, {total_err} errors)\n")
+
+    print(f"{'operation':<12}{'count':>8}{'errors':>8}{'err %':>8}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for op, s in stats.items():
+        count = len(s.latencies) + s.errors
+        if not count:
+            continue
+        print(
+            f"{op:<12}{count:>8}{s.errors:>8}{100 * s.errors / count:>8.2f}"
+            f"{s.percentile(50) * 1000:>9.2f}{s.percentile(90) * 1000:>9.2f}"
+            f"{s.percentile(99) * 1000:>9.2f}{s.percentile(100) * 1000:>9.2f}"
+        )
+
+    print()
+    if monitor.available:
+        cpu = monitor.cpu_end - monitor.cpu_start
+        print(f"Server CPU:  {cpu:.2f}s ({100 * cpu / elapsed:.0f}% of one core)")
+        print(f"Server RSS:  {monitor.peak_rss / 1024 / 1024:.1f} MiB peak (all sessions)")
+    else:
+        print("Server CPU/RSS: not available on this platform (needs /proc)")
+    # The client is a single process: near 100% here means the load test
+    # itself, not the server, limited the results
+    print(f"Client CPU:  {client_cpu:.2f}s ({100 * client_cpu / elapsed:.0f}% of one core)")
+    if max_lag is not None:
+        print(f"Client lag:  {max_lag * 1000:.1f} ms behind schedule at worst (included in latencies)")
+    print(f"{'='*60}\n")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load test an MCP server over stdio")
+    parser.add_argument("--command", default=sys.executable, help="Server command (default: this Python)")
+    parser.add_argument("--server-args", nargs="*", default=["simple_server.py"], help="Server arguments")
+    parser.add_argument("--sessions", type=int, default=4, help="Number of sessions (server processes)")
+    parser.add_argument("--concurrency", type=int, default=16, help="In-flight requests for closed-loop mode")
+    parser.add_argument("--rate", type=float, help="Requests per second; switches to open-loop mode")
+    parser.add_argument("--duration", type=float, default=10.0, help="Test length in seconds")
+    parser.add_argument("--mix", default="call_tool=0.9,list_tools=0.1", help="Operation weights")
+    parser.add_argument("--tool", default="add", help="Tool to call")
+    parser.add_argument("--args", default='{"a": 1, "b": 2}', help="Tool arguments as JSON")
+    parser.add_argument("--seed", type=int, help="Random seed for the operation mix")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    weights_by_op = parse_mix(args.mix)
+    ops, weights = list(weights_by_op), list(weights_by_op.values())
+    tool_args = json.loads(args.args)
+    stats = {op: Stats() for op in ops}
+
+    async with AsyncExitStack() as exit_stack:
+        print(f"Starting {args.sessions} sessions...")
+        sessions = await open_sessions(exit_stack, args.command, args.server_args, args.sessions)
+
+        monitor = ServerMonitor()
+        monitor.start()
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+
+        max_lag = None
+        if args.rate:
+            max_lag = await open_loop(
+                sessions, ops, weights, args.tool, tool_args, stats, args.rate, args.duration
+            )
+        else:
+            await closed_loop(
+                sessions, ops, weights, args.tool, tool_args, stats, args.concurrency, args.duration
+            )
+
+        elapsed = time.perf_counter() - start
+        client_cpu = time.process_time() - cpu_start
+        await monitor.stop()
+
+    print_report(stats, elapsed, monitor, client_cpu, max_lag, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
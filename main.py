@@ -1,9 +1,17 @@
+import argparse
 import asyncio
 from client import MCPClient
 
 
 async def main():
     """Main entry point for the MCP client"""
+    parser = argparse.ArgumentParser(description="Chat with Claude using MCP tools")
+    parser.add_argument(
+        "--snapshot",
+        help="Keep the conversation in this file and resume from it on restart",
+    )
+    args = parser.parse_args()
+
     client = MCPClient()
 
     try:
@@ -12,7 +20,7 @@ async def main():
         await client.connect_to_server("simple_server.py")
 
         # Start the interactive chat loop
-        await client.chat_loop()
+        await client.chat_loop(snapshot_path=args.snapshot)
 
     finally:
         # Clean up resources
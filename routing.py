@@ -0,0 +1,157 @@
+"""
+Model tiering for the agentic loop
+
+Most turns of process_query only pick the next tool call, which a small,
+fast model handles well. The router sends those turns to the small tier
+and escalates to the large tier for the final answer, when the small
+model fails, or when it calls a tool the server does not have.
+
+Routing can be configured per server (the name the server reports on
+initialize, or the name given to EnhancedMCPClient.register_server) and
+per tool (the turn right after that tool ran, e.g. when its output needs
+careful reading).
+"""
+
+import asyncio
+import time
+
+from anthropic import APIError, APITimeoutError, AsyncAnthropic
+
+SMALL = "small"
+LARGE = "large"
+
+DEFAULT_SMALL_MODEL = "claude-haiku-4-5"
+# Use alias for latest version (or use "claude-sonnet-4-5-20250929" to pin a specific version)
+DEFAULT_LARGE_MODEL = "claude-sonnet-4-5"
+
+
+class TierStats:
+    """Latency and token usage for one tier"""
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.escalations = 0
+
+    def record(self, seconds: float, usage):
+        self.calls += 1
+        self.seconds += seconds
+        if usage is not None:
+            self.input_tokens += usage.input_tokens
+            self.output_tokens += usage.output_tokens
+
+
+class ModelRouter:
+    """Chooses the model for each turn and tracks usage per tier"""
+
+    def __init__(
+        self,
+        small_model: str = DEFAULT_SMALL_MODEL,
+        large_model: str = DEFAULT_LARGE_MODEL,
+        small_max_tokens: int = 1024,
+        large_max_tokens: int = 4096,
+        server_tiers: dict[str, str] | None = None,
+        tool_tiers: dict[str, str] | None = None,
+    ):
+        """
+        Args:
+            small_model: Model for tool-selection turns
+            large_model: Model for final answers and escalations
+            small_max_tokens: max_tokens for the small model
+            large_max_tokens: max_tokens for the large model
+            server_tiers: Starting tier per server name (default: SMALL)
+            tool_tiers: Tier for the turn that follows a call to the named tool
+        """
+        self.models = {SMALL: small_model, LARGE: large_model}
+        self.max_tokens = {SMALL: small_max_tokens, LARGE: large_max_tokens}
+        self.server_tiers = server_tiers or {}
+        self.tool_tiers = tool_tiers or {}
+        self.stats = {SMALL: TierStats(), LARGE: TierStats()}
+
+    def reset_stats(self):
+        self.stats = {SMALL: TierStats(), LARGE: TierStats()}
+
+    def tier_for_turn(self, server_name: str | None, last_tools: list[str]) -> str:
+        """Pick the tier for the next turn
+
+        Args:
+            server_name: Name of the connected server
+            last_tools: Tools called in the previous turn
+        """
+        if any(self.tool_tiers.get(name) == LARGE for name in last_tools):
+            return LARGE
+        if last_tools and all(self.tool_tiers.get(name) == SMALL for name in last_tools):
+            return SMALL
+        return self.server_tiers.get(server_name, SMALL)
+
+    async def call_model(self, anthropic: AsyncAnthropic, tier: str, **kwargs):
+        """Send one messages.create request on the given tier
+
+        The SDK applies `timeout` to each attempt and retries with backoff,
+        so the whole request, retries included, is also limited to `timeout`
+        seconds here. Raises TimeoutError when that runs out.
+        """
+        start = time.perf_counter()
+        async with asyncio.timeout(kwargs.get("timeout")):
+            response = await anthropic.messages.create(
+                model=self.models[tier],
+                max_tokens=kwargs.pop("max_tokens", self.max_tokens[tier]),
+                **kwargs,
+            )
+        self.stats[tier].record(time.perf_counter() - start, getattr(response, "usage", None))
+        return response
+
+    async def run_turn(
+        self, anthropic: AsyncAnthropic, tier: str, tool_names: set[str], **kwargs
+    ):
+        """Run one turn, escalating from the small to the large tier if needed
+
+        The small model's reply is only kept when it asks for tools that
+        exist. Anything else (a final answer, a truncated reply, an unknown
+        tool, an API error) is re-run on the large model.
+        """
+        if tier == SMALL:
+            start = time.perf_counter()
+            try:
+                response = await self.call_model(anthropic, SMALL, **kwargs)
+            except (APITimeoutError, TimeoutError):
+                raise
+            except APIError:
+                response = None
+
+            if response is not None and self._selects_known_tools(response, tool_names):
+                return response
+
+            self.stats[SMALL].escalations += 1
+            if kwargs.get("timeout") is not None:
+                kwargs["timeout"] = max(0.0, kwargs["timeout"] - (time.perf_counter() - start))
+
+        return await self.call_model(anthropic, LARGE, **kwargs)
+
+    @staticmethod
+    def _selects_known_tools(response, tool_names: set[str]) -> bool:
+        if response.stop_reason != "tool_use":
+            return False
+        return all(
+            block.name in tool_names
+            for block in response.content
+            if block.type == "tool_use"
+        )
+
+    def report(self) -> str:
+        """Per-tier latency and token usage"""
+        lines = ["Model usage:"]
+        for tier, stats in self.stats.items():
+            if not stats.calls:
+                continue
+            line = (
+                f"  {tier} ({self.models[tier]}): {stats.calls} calls, "
+                f"{stats.seconds:.2f}s total ({stats.seconds / stats.calls:.2f}s avg), "
+                f"{stats.input_tokens} in / {stats.output_tokens} out tokens"
+            )
+            if stats.escalations:
+                line += f", {stats.escalations} escalated"
+            lines.append(line)
+        return "\n".join(lines)
@@ -1,4 +1,9 @@
 import asyncio
+import fnmatch
+import math
+import os
+import time
+import jsonschema
 from mcp.server.models import InitializationOptions
 from mcp.server import NotificationOptions, Server
 import mcp.server.stdio
@@ -9,87 +14,355 @@ import mcp.types as types
 server = Server("simple-calculator")
 
 
-@server.list_tools()
-async def handle_list_tools() -> list[types.Tool]:
-    """List available tools"""
-    return [
-        types.Tool(
-            name="add",
-            description="Add two numbers together",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "a": {"type": "number", "description": "First number"},
-                    "b": {"type": "number", "description": "Second number"},
-                },
-                "required": ["a", "b"],
-            },
-        ),
-        types.Tool(
-            name="multiply",
-            description="Multiply two numbers",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "a": {"type": "number", "description": "First number"},
-                    "b": {"type": "number", "description": "Second number"},
-                },
-                "required": ["a", "b"],
-            },
-        ),
-        types.Tool(
-            name="greet",
-            description="Generate a personalized greeting",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "name": {"type": "string", "description": "Name to greet"},
-                },
-                "required": ["name"],
-            },
-        ),
-    ]
+class RegisteredTool:
+    """A tool definition with its handler and a compiled argument validator"""
 
+    def __init__(self, definition: types.Tool, handler):
+        self.definition = definition
+        self.handler = handler
+        validator_class = jsonschema.validators.validator_for(definition.inputSchema)
+        validator_class.check_schema(definition.inputSchema)
+        self.validator = validator_class(definition.inputSchema)
 
-@server.call_tool()
-async def handle_call_tool(
-    name: str, arguments: dict | None
-) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
-    """Handle tool execution"""
 
-    if name == "add":
-        a = arguments.get("a")
-        b = arguments.get("b")
-        result = a + b
-        return [
-            types.TextContent(
-                type="text",
-                text=f"The sum of {a} and {b} is {result}"
+class ToolRegistry:
+    """Tools registered with a decorator
+
+    The tool list is built once, calls are dispatched by a dict lookup,
+    and each tool's inputSchema is compiled into a validator once instead
+    of on every call.
+    """
+
+    def __init__(self):
+        self._tools: dict[str, RegisteredTool] = {}
+        self._tool_list: list[types.Tool] = []
+
+    def tool(
+        self,
+        name: str,
+        description: str,
+        input_schema: dict,
+        annotations: types.ToolAnnotations | None = None,
+    ):
+        """Register a handler; it receives the validated arguments as keywords
+
+        Arguments the schema does not declare are rejected (unless the
+        schema sets additionalProperties itself), since the handler could
+        not accept them as keywords.
+        """
+        input_schema = {"additionalProperties": False, **input_schema}
+
+        def decorator(func):
+            definition = types.Tool(
+                name=name,
+                description=description,
+                inputSchema=input_schema,
+                annotations=annotations,
             )
-        ]
+            self._tools[name] = RegisteredTool(definition, func)
+            self._tool_list.append(definition)
+            return func
+
+        return decorator
 
-    elif name == "multiply":
-        a = arguments.get("a")
-        b = arguments.get("b")
-        result = a * b
-        return [
-            types.TextContent(
-                type="text",
-                text=f"The product of {a} and {b} is {result}"
+    def list_tools(self) -> list[types.Tool]:
+        return self._tool_list
+
+    async def call_tool(
+        self, name: str, arguments: dict | None
+    ) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource] | types.CallToolResult:
+        """Validate the arguments and run the tool, or return a structured error"""
+        tool = self._tools.get(name)
+        if tool is None:
+            return tool_error(
+                "unknown_tool",
+                f"Unknown tool: {name}",
+                name,
+                available=list(self._tools),
             )
+
+        arguments = arguments or {}
+        errors = [
+            {
+                "path": "/".join(str(part) for part in error.absolute_path),
+                "message": error.message,
+            }
+            for error in tool.validator.iter_errors(arguments)
         ]
+        if errors:
+            details = "; ".join(
+                f"{e['path']}: {e['message']}" if e["path"] else e["message"]
+                for e in errors
+            )
+            return tool_error(
+                "invalid_arguments",
+                f"Invalid arguments for {name}: {details}",
+                name,
+                errors=errors,
+            )
+
+        return await tool.handler(**arguments)
+
+
+def tool_error(code: str, message: str, tool_name: str, **details) -> types.CallToolResult:
+    """An isError result with a machine-readable error in structuredContent"""
+    return types.CallToolResult(
+        content=[types.TextContent(type="text", text=message)],
+        structuredContent={
+            "error": {"code": code, "message": message, "tool": tool_name, **details}
+        },
+        isError=True,
+    )
+
+
+tools = ToolRegistry()
+
+# Same arguments, same result, no side effects: clients may cache the result
+PURE = types.ToolAnnotations(readOnlyHint=True, idempotentHint=True)
+
+
+@tools.tool(
+    name="add",
+    description="Add two numbers together",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "a": {"type": "number", "description": "First number"},
+            "b": {"type": "number", "description": "Second number"},
+        },
+        "required": ["a", "b"],
+    },
+    annotations=PURE,
+)
+async def add(a: float, b: float):
+    result = a + b
+    return [
+        types.TextContent(
+            type="text",
+            text=f"The sum of {a} and {b} is {result}"
+        )
+    ]
+
+
+@tools.tool(
+    name="multiply",
+    description="Multiply two numbers",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "a": {"type": "number", "description": "First number"},
+            "b": {"type": "number", "description": "Second number"},
+        },
+        "required": ["a", "b"],
+    },
+    annotations=PURE,
+)
+async def multiply(a: float, b: float):
+    result = a * b
+    return [
+        types.TextContent(
+            type="text",
+            text=f"The product of {a} and {b} is {result}"
+        )
+    ]
+
+
+@tools.tool(
+    name="greet",
+    description="Generate a personalized greeting",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "name": {"type": "string", "description": "Name to greet"},
+        },
+        "required": ["name"],
+    },
+    annotations=PURE,
+)
+async def greet(name: str):
+    return [
+        types.TextContent(
+            type="text",
+            text=f"Hello, {name}! Welcome to the MCP world!"
+        )
+    ]
 
-    elif name == "greet":
-        name_to_greet = arguments.get("name")
-        return [
-            types.TextContent(
-                type="text",
-                text=f"Hello, {name_to_greet}! Welcome to the MCP world!"
+
+# Long-running tools report progress at most this often
+PROGRESS_INTERVAL_SECONDS = 0.2
+
+# ...and give the event loop a turn at least this often, so the server keeps
+# answering other requests and notices cancellations while they run
+YIELD_INTERVAL_SECONDS = 0.005
+
+
+class Checkpoint:
+    """Lets a CPU-bound tool yield to the event loop every few milliseconds
+
+    Await it inside the tool's innermost loop; it only actually yields
+    once YIELD_INTERVAL_SECONDS have passed since the last time.
+    """
+
+    def __init__(self, interval: float = YIELD_INTERVAL_SECONDS):
+        self.interval = interval
+        self._last = time.monotonic()
+
+    async def __call__(self):
+        if time.monotonic() - self._last >= self.interval:
+            await asyncio.sleep(0)
+            self._last = time.monotonic()
+
+
+async def report_progress(progress: float, total: float | None = None, message: str | None = None):
+    """Send a progress notification for the current tool call
+
+    Does nothing if the client did not ask for progress (no progressToken).
+    The message carries the partial result so far.
+    """
+    ctx = server.request_context
+    if ctx.meta is None or ctx.meta.progressToken is None:
+        return
+    await ctx.session.send_progress_notification(
+        ctx.meta.progressToken,
+        progress,
+        total,
+        message,
+        related_request_id=str(ctx.request_id),
+    )
+
+
+@tools.tool(
+    name="scan_directory",
+    description="Recursively count files and total size under a directory, optionally filtered by a glob pattern. Can take a while on large trees.",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "path": {"type": "string", "description": "Directory to scan"},
+            "pattern": {"type": "string", "description": "Glob pattern for file names (default: *)"},
+        },
+        "required": ["path"],
+    },
+    annotations=types.ToolAnnotations(readOnlyHint=True),
+)
+async def scan_directory(path: str, pattern: str = "*"):
+    if not os.path.isdir(path):
+        return tool_error("not_a_directory", f"Not a directory: {path}", "scan_directory")
+
+    file_count = 0
+    total_bytes = 0
+    largest: list[tuple[int, str]] = []
+    checkpoint = Checkpoint()
+    last_report = time.monotonic()
+
+    # os.scandir hands out entries one at a time, so even a directory with
+    # millions of files is read in small steps between checkpoints
+    pending = [path]
+    while pending:
+        dirpath = pending.pop()
+        try:
+            entries = os.scandir(dirpath)
+        except OSError:
+            continue
+
+        with entries:
+            for entry in entries:
+                await checkpoint()
+                try:
+                    if entry.is_dir():
+                        if not entry.is_symlink():
+                            pending.append(entry.path)
+                        continue
+                    if not fnmatch.fnmatch(entry.name, pattern):
+                        continue
+                    size = entry.stat().st_size
+                except OSError:
+                    continue
+                file_count += 1
+                total_bytes += size
+                largest = sorted(largest + [(size, entry.path)], reverse=True)[:5]
+
+                # Report what has been found so far
+                if time.monotonic() - last_report >= PROGRESS_INTERVAL_SECONDS:
+                    last_report = time.monotonic()
+                    await report_progress(
+                        file_count,
+                        message=f"{file_count} files, {total_bytes} bytes so far (in {dirpath})",
+                    )
+
+    lines = [f"Found {file_count} files matching '{pattern}' under {path}, {total_bytes} bytes in total."]
+    if largest:
+        lines.append("Largest files:")
+        lines.extend(f"  {size} bytes  {file_path}" for size, file_path in largest)
+    return [types.TextContent(type="text", text="\n".join(lines))]
+
+
+# Numbers count_primes checks between checkpoints (a few milliseconds at most)
+PRIME_STEP = 32
+
+
+@tools.tool(
+    name="count_primes",
+    description="Count the prime numbers below a limit (up to one billion), in batches. Large limits take a while.",
+    input_schema={
+        "type": "object",
+        "properties": {
+            # Bounded so that checking a single number stays well under a millisecond
+            "limit": {"type": "integer", "minimum": 2, "maximum": 10**9, "description": "Count primes below this number"},
+            "batch_size": {"type": "integer", "minimum": 1, "maximum": 10**6, "description": "Numbers checked between progress reports (default: 10000)"},
+        },
+        "required": ["limit"],
+    },
+    annotations=PURE,
+)
+async def count_primes(limit: int, batch_size: int = 10_000):
+    found = 0
+    checkpoint = Checkpoint()
+    last_report = time.monotonic()
+
+    for batch_start in range(2, limit, batch_size):
+        batch_end = min(batch_start + batch_size, limit)
+        for step_start in range(batch_start, batch_end, PRIME_STEP):
+            step_end = min(step_start + PRIME_STEP, batch_end)
+            found += sum(1 for n in range(step_start, step_end) if _is_prime(n))
+            await checkpoint()
+
+        if time.monotonic() - last_report >= PROGRESS_INTERVAL_SECONDS:
+            last_report = time.monotonic()
+            await report_progress(
+                batch_end, limit, message=f"{found} primes below {batch_end} so far"
             )
-        ]
 
-    else:
-        raise ValueError(f"Unknown tool: {name}")
+    await report_progress(limit, limit, message=f"{found} primes below {limit}")
+    return [
+        types.TextContent(
+            type="text",
+            text=f"There are {found} primes below {limit}"
+        )
+    ]
+
+
+def _is_prime(n: int) -> bool:
+    if n < 4:
+        return n > 1
+    if n % 2 == 0:
+        return False
+    return all(n % d for d in range(3, math.isqrt(n) + 1, 2))
+
+
+@server.list_tools()
+async def handle_list_tools() -> list[types.Tool]:
+    """List available tools"""
+    return tools.list_tools()
+
+
+# Arguments are checked by the registry's precompiled validators, so the
+# SDK's per-call jsonschema.validate is turned off.
+@server.call_tool(validate_input=False)
+async def handle_call_tool(
+    name: str, arguments: dict | None
+) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource] | types.CallToolResult:
+    """Handle tool execution"""
+    return await tools.call_tool(name, arguments)
 
 
 async def main():
@@ -0,0 +1,303 @@
+"""
+Session snapshots for resuming a chat
+
+A snapshot holds what a chat needs to pick up where it left off: the
+conversation (messages), which images and other blobs were already sent
+in it, and cached tool results, so expensive tool calls are not re-run
+after a restart. Cached results are kept with a fingerprint of the tool
+definition they came from, and dropped once the server's tool changes.
+
+File layout (one file):
+
+    b"MCPSNAP1" | header length (8 bytes, little-endian) | JSON header | payloads
+
+Large values (base64 images, documents and blobs, long texts) are moved out of
+the JSON header into the payload section. Base64 data is stored decoded,
+which makes it 25% smaller, and identical payloads are stored once.
+Restoring only parses the header and maps the file. Payloads are read
+when a message or cached result that needs them is first used.
+
+Payload references are JSON objects with a single "$payload" key. Keys of
+the conversation's own objects that start with "$" are escaped with an
+extra "$" on save, so they can never be mistaken for a reference.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import mcp.types as types
+
+from binary_content import Blob, BlobLimits, BlobStore
+
+MAGIC = b"MCPSNAP1"
+VERSION = 2
+HEADER_LENGTH = struct.Struct("<Q")
+
+# Strings at least this long are stored in the payload section
+PAYLOAD_THRESHOLD = 16 * 1024
+
+_REF_KEY = "$payload"
+
+
+class PayloadRef:
+    """A large string that is still on disk"""
+
+    def __init__(self, snapshot: "_SnapshotFile", offset: int, length: int, encoding: str):
+        self.snapshot = snapshot
+        self.offset = offset
+        self.length = length
+        self.encoding = encoding  # "base64" (stored decoded) or "utf-8"
+
+    @property
+    def raw(self) -> memoryview:
+        """The stored bytes, without copying them out of the mapped file"""
+        return self.snapshot.view[self.offset : self.offset + self.length]
+
+    def load(self) -> str:
+        if self.encoding == "base64":
+            return base64.b64encode(self.raw).decode("ascii")
+        return str(self.raw, "utf-8")
+
+
+class _SnapshotFile:
+    """An open, memory-mapped snapshot file backing PayloadRefs"""
+
+    def __init__(self, path: str, payload_start: int):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self._map)[payload_start:]
+
+
+def is_cacheable(tool: types.Tool) -> bool:
+    """Whether the server marks the tool as safe to answer from a cache"""
+    annotations = tool.annotations
+    return bool(annotations and annotations.readOnlyHint and annotations.idempotentHint)
+
+
+def tool_fingerprint(tool: types.Tool) -> str:
+    """Hash of a tool's definition (description, schemas, annotations)"""
+    definition = tool.model_dump(mode="json", exclude_none=True)
+    return hashlib.sha256(json.dumps(definition, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class SessionState:
+    """Conversation, blobs sent in it, and cached tool results of one chat"""
+
+    def __init__(self, blob_limits: BlobLimits | None = None):
+        self.messages: list[dict] = []
+        self.blobs = BlobStore(blob_limits)
+        # MCP content as the server returned it, by tool name and arguments.
+        # It is converted for Claude (and deduplicated) by the conversation
+        # that replays it.
+        self.tool_results: dict[str, dict[str, list]] = {}
+        # Fingerprint of the tool definition each tool's results came from
+        self.tool_fingerprints: dict[str, str] = {}
+
+    @staticmethod
+    def cache_key(tool_args: dict | None) -> str:
+        return json.dumps(tool_args or {}, sort_keys=True)
+
+    @property
+    def cached_result_count(self) -> int:
+        return sum(len(results) for results in self.tool_results.values())
+
+    def cached_result(
+        self, tool_name: str, tool_args: dict | None
+    ) -> list[types.ContentBlock] | None:
+        """Cached MCP content of this exact call, if any"""
+        content = self.tool_results.get(tool_name, {}).get(self.cache_key(tool_args))
+        if content is None:
+            return None
+        return types.CallToolResult.model_validate({"content": materialize(content)}).content
+
+    def cache_result(self, tool: types.Tool, tool_args: dict | None, content: list):
+        """Cache the MCP content of a successful call to a cacheable tool"""
+        fingerprint = tool_fingerprint(tool)
+        if self.tool_fingerprints.get(tool.name) != fingerprint:
+            # Results of an older definition of the tool are no longer valid
+            self.tool_results[tool.name] = {}
+            self.tool_fingerprints[tool.name] = fingerprint
+        self.tool_results[tool.name][self.cache_key(tool_args)] = [
+            item.model_dump(mode="json", exclude_none=True) for item in content
+        ]
+
+    def sync_tools(self, tools: list[types.Tool]):
+        """Drop cached results of tools that are gone or whose definition changed
+
+        Called with the current tool list, e.g. after restoring a snapshot.
+        """
+        current = {tool.name: tool for tool in tools}
+        for name in list(self.tool_results):
+            tool = current.get(name)
+            if tool is None or tool_fingerprint(tool) != self.tool_fingerprints.get(name):
+                del self.tool_results[name]
+                self.tool_fingerprints.pop(name, None)
+
+    def save(self, path: str):
+        """Write a snapshot (atomically: readers never see a partial file)"""
+        writer = _PayloadWriter()
+        header = {
+            "version": VERSION,
+            "messages": writer.externalize(self.messages),
+            "blobs": [
+                [blob.digest, blob.media_type, blob.source, blob.size]
+                for blob in self.blobs.blobs.values()
+            ],
+            "tool_results": writer.externalize(self.tool_results),
+            "tool_fingerprints": self.tool_fingerprints,
+        }
+        header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(HEADER_LENGTH.pack(len(header_bytes)))
+            f.write(header_bytes)
+            for chunk in writer.chunks:
+                f.write(chunk)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, blob_limits: BlobLimits | None = None) -> "SessionState":
+        """Restore a snapshot; large payloads stay on disk until used"""
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a session snapshot: {path}")
+            (header_length,) = HEADER_LENGTH.unpack(f.read(HEADER_LENGTH.size))
+            header_bytes = f.read(header_length)
+
+        payload_start = len(MAGIC) + HEADER_LENGTH.size + header_length
+        snapshot = None
+        if os.path.getsize(path) > payload_start:
+            snapshot = _SnapshotFile(path, payload_start)
+
+        def to_ref(obj: dict):
+            if _REF_KEY in obj:
+                offset, length, encoding = obj[_REF_KEY]
+                return PayloadRef(snapshot, offset, length, encoding)
+            return obj
+
+        def to_ref_unescaped(obj: dict):
+            if _REF_KEY in obj:
+                return to_ref(obj)
+            return {key[1:] if key.startswith("$$") else key: value for key, value in obj.items()}
+
+        # Escaped keys are rare; only pay for unescaping when there are some
+        escaped = b'"$$' in header_bytes
+        header = json.loads(header_bytes, object_hook=to_ref_unescaped if escaped else to_ref)
+        if header.get("version") != VERSION:
+            raise ValueError(f"Unsupported snapshot version {header.get('version')}: {path}")
+        state = cls(blob_limits)
+        state.messages = header["messages"]
+        state.tool_results = header["tool_results"]
+        state.tool_fingerprints = header["tool_fingerprints"]
+        for digest, media_type, source, size in header["blobs"]:
+            state.blobs.blobs[digest] = Blob(media_type, digest, source, size)
+            state.blobs.total_bytes += size
+        return state
+
+
+class _PayloadWriter:
+    """Collects large strings into the payload section while saving"""
+
+    def __init__(self):
+        self.chunks: list[bytes | memoryview] = []
+        self.size = 0
+        self._written: dict[str, list] = {}
+        self._copied: dict[tuple[int, int], list] = {}
+
+    def externalize(self, obj):
+        """JSON-ready copy of obj with large strings replaced by payload refs"""
+        if isinstance(obj, PayloadRef):
+            # Still on disk from the snapshot this state was loaded from
+            key = (id(obj.snapshot), obj.offset)
+            if key not in self._copied:
+                self._copied[key] = self._add_raw(obj.raw, obj.encoding)
+            return {_REF_KEY: self._copied[key]}
+        if hasattr(obj, "model_dump"):
+            # Content blocks returned by the Anthropic SDK
+            obj = obj.model_dump(mode="json", exclude_none=True)
+        if isinstance(obj, dict):
+            # Base64 data (Claude sources, MCP images and blobs) is stored decoded
+            base64_key = _base64_key(obj)
+            return {
+                _escape_key(key): (
+                    self._add_string(value, "base64")
+                    if key == base64_key and isinstance(value, str)
+                    else self.externalize(value)
+                )
+                for key, value in obj.items()
+            }
+        if isinstance(obj, list):
+            return [self.externalize(value) for value in obj]
+        if isinstance(obj, str) and len(obj) >= PAYLOAD_THRESHOLD:
+            return self._add_string(obj, "utf-8")
+        return obj
+
+    def _add_string(self, value: str, encoding: str):
+        if len(value) < PAYLOAD_THRESHOLD:
+            return value
+        # Identical payloads (the same image in several places) are stored once
+        ref = self._written.get(value)
+        if ref is None:
+            data = _decode_base64(value) if encoding == "base64" else None
+            if data is None:
+                encoding = "utf-8"
+                data = value.encode("utf-8")
+            ref = self._add_raw(data, encoding)
+            self._written[value] = ref
+        return {_REF_KEY: ref}
+
+    def _add_raw(self, data: bytes | memoryview, encoding: str) -> list:
+        ref = [self.size, len(data), encoding]
+        self.chunks.append(data)
+        self.size += len(data)
+        return ref
+
+
+def _base64_key(obj: dict) -> str | None:
+    """Key holding base64 data in a Claude source or MCP content, if any"""
+    if obj.get("type") in ("base64", "image", "audio"):
+        return "data"
+    if "blob" in obj and "uri" in obj:
+        return "blob"
+    return None
+
+
+def _escape_key(key: str) -> str:
+    # "$payload" -> "$$payload", "$$x" -> "$$$x"; to_ref strips one "$" again
+    return f"${key}" if key.startswith("$") else key
+
+
+def _decode_base64(value: str) -> bytes | None:
+    """Decoded bytes, or None unless encoding them gives back exactly `value`"""
+    try:
+        data = base64.b64decode(value, validate=True)
+    except binascii.Error:
+        return None
+    # Only the last 4 characters can hold bits that decoding drops
+    if not value.endswith(base64.b64encode(data[-(len(data) % 3 or 3):]).decode("ascii")):
+        return None
+    return data
+
+
+def materialize(obj):
+    """Load any payloads still on disk, in place, and return obj"""
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            if isinstance(value, PayloadRef):
+                obj[key] = value.load()
+            elif isinstance(value, (dict, list)):
+                materialize(value)
+    elif isinstance(obj, list):
+        for index, value in enumerate(obj):
+            if isinstance(value, PayloadRef):
+                obj[index] = value.load()
+            elif isinstance(value, (dict, list)):
+                materialize(value)
+    return obj
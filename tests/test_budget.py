@@ -0,0 +1,88 @@
+"""
+Query budgets against a real server: simple_server.py over stdio
+"""
+
+import asyncio
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+from budget import BudgetExceeded, QueryBudget, ToolCallCancelled, call_tool_with_deadline
+
+SERVER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "simple_server.py")
+
+# Takes minutes to finish, so it is always still running when the budget ends
+SLOW_CALL = ("count_primes", {"limit": 10**9, "batch_size": 10**6})
+
+BUDGET_SECONDS = 0.5
+# How late BudgetExceeded may be, and how long the next request may take
+MARGIN_SECONDS = 0.25
+
+
+@asynccontextmanager
+async def server_session():
+    params = StdioServerParameters(command=sys.executable, args=[SERVER])
+    async with stdio_client(params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            yield session
+
+
+async def assert_answers_promptly(session: ClientSession):
+    """The server is free again: the slow call was cancelled on its side too"""
+    start = time.monotonic()
+    result = await asyncio.wait_for(session.call_tool("add", {"a": 2, "b": 3}), timeout=5)
+    assert time.monotonic() - start < MARGIN_SECONDS
+    assert result.content[0].text == "The sum of 2 and 3 is 5"
+
+
+def test_deadline_cancels_slow_tool():
+    async def scenario():
+        async with server_session() as session:
+            budget = QueryBudget(timeout_seconds=BUDGET_SECONDS)
+            start = time.monotonic()
+            with pytest.raises(BudgetExceeded):
+                await call_tool_with_deadline(session, *SLOW_CALL, budget)
+            elapsed = time.monotonic() - start
+
+            assert BUDGET_SECONDS - 0.05 <= elapsed < BUDGET_SECONDS + MARGIN_SECONDS
+            await assert_answers_promptly(session)
+
+    asyncio.run(scenario())
+
+
+def test_progress_handler_cancels_slow_tool():
+    updates = []
+
+    def on_progress(progress, total, message):
+        updates.append(progress)
+        return False
+
+    async def scenario():
+        async with server_session() as session:
+            with pytest.raises(ToolCallCancelled):
+                await call_tool_with_deadline(
+                    session,
+                    "count_primes",
+                    {"limit": 10**9},
+                    QueryBudget(timeout_seconds=30),
+                    on_progress=on_progress,
+                )
+            await assert_answers_promptly(session)
+
+    asyncio.run(scenario())
+    assert len(updates) == 1
+
+
+def test_no_call_once_budget_is_spent():
+    async def scenario():
+        async with server_session() as session:
+            with pytest.raises(BudgetExceeded):
+                await call_tool_with_deadline(session, "add", {"a": 1, "b": 2}, QueryBudget(timeout_seconds=0))
+
+    asyncio.run(scenario())
@@ -0,0 +1,106 @@
+"""
+Lazy servers: simple_server.py started on demand over stdio
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+from lazy_servers import LazyServerPool, ServerStartError
+
+SERVER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "simple_server.py")
+
+# The shell lingers after the server exits, so shutting down takes a second
+SLOW_EXIT = ["-c", f'"{sys.executable}" "{SERVER}"; sleep 1']
+
+
+async def call_add(pool: LazyServerPool, a: int = 1, b: int = 2) -> str:
+    async with pool.session_for("add") as session:
+        result = await session.call_tool("add", {"a": a, "b": b})
+    return result.content[0].text
+
+
+async def wait_for(condition, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_register_reuses_cached_manifest(tmp_path):
+    async def scenario():
+        first = LazyServerPool(manifest_dir=str(tmp_path))
+        tools = await first.register("calc", sys.executable, [SERVER])
+        # Started only to fetch the manifest, and stopped again
+        assert first.servers["calc"].starts == 1
+        assert not first.servers["calc"].running
+
+        second = LazyServerPool(manifest_dir=str(tmp_path))
+        cached = await second.register("calc", sys.executable, [SERVER])
+        assert [tool.name for tool in cached] == [tool.name for tool in tools]
+        assert second.servers["calc"].starts == 0
+        assert second.owner("add") is second.servers["calc"]
+
+    asyncio.run(scenario())
+
+
+def test_idle_server_stops_and_restarts(tmp_path):
+    async def scenario():
+        pool = LazyServerPool(idle_timeout=0.3, manifest_dir=str(tmp_path))
+        await pool.register("calc", sys.executable, [SERVER])
+        server = pool.servers["calc"]
+
+        assert await call_add(pool) == "The sum of 1 and 2 is 3"
+        assert server.running
+        await wait_for(lambda: not server.running)
+
+        assert await call_add(pool, 2, 3) == "The sum of 2 and 3 is 5"
+        assert server.starts == 3  # manifest, first call, restart
+        await pool.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_call_during_idle_shutdown_restarts_server(tmp_path):
+    async def scenario():
+        pool = LazyServerPool(idle_timeout=0.3, manifest_dir=str(tmp_path))
+        await pool.register("calc", "sh", SLOW_EXIT)
+        server = pool.servers["calc"]
+
+        await call_add(pool)
+        await wait_for(lambda: server.stopping)
+
+        assert await call_add(pool, 2, 3) == "The sum of 2 and 3 is 5"
+        assert server.running and not server.stopping
+        await pool.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_failed_start_raises_server_start_error(tmp_path):
+    async def scenario():
+        pool = LazyServerPool(manifest_dir=str(tmp_path))
+        with pytest.raises(ServerStartError, match="missing"):
+            await pool.register("missing", os.path.join(str(tmp_path), "no-such-server"))
+        assert "missing" not in pool.servers
+
+    asyncio.run(scenario())
+
+
+def test_registering_a_name_again_stops_the_old_server(tmp_path):
+    async def scenario():
+        pool = LazyServerPool(manifest_dir=str(tmp_path))
+        await pool.register("calc", sys.executable, [SERVER])
+        old = pool.servers["calc"]
+        await call_add(pool)
+        assert old.running
+
+        await pool.register("calc", sys.executable, [SERVER, "--again"])
+        assert not old.running
+        assert pool.servers["calc"] is not old
+        await pool.aclose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,111 @@
+"""
+Session snapshots: round-trips, escaping, and the tool-result cache
+"""
+
+import base64
+import os
+
+from mcp import types
+
+from snapshots import PAYLOAD_THRESHOLD, SessionState, materialize
+
+READ_FILE = types.Tool(
+    name="read_file",
+    inputSchema={"type": "object", "properties": {"path": {"type": "string"}}},
+    annotations=types.ToolAnnotations(readOnlyHint=True, idempotentHint=True),
+)
+
+SCREENSHOT = base64.b64encode(os.urandom(PAYLOAD_THRESHOLD)).decode("ascii")
+
+
+def image_block(data: str) -> dict:
+    return {"type": "image", "source": {"type": "base64", "media_type": "image/png", "data": data}}
+
+
+def reload(state: SessionState, path) -> SessionState:
+    state.save(path)
+    return SessionState.load(path)
+
+
+def test_round_trip_keeps_dollar_keys_and_payloads(tmp_path):
+    state = SessionState()
+    tool_input = {"$payload": 0, "$$x": "a", "$y": {"$payload": [1, 2]}, "text": "x" * PAYLOAD_THRESHOLD}
+    state.messages = [
+        {"role": "assistant", "content": [{"type": "tool_use", "id": "t1", "name": "echo", "input": tool_input}]},
+        {"role": "user", "content": [{"type": "tool_result", "tool_use_id": "t1", "content": [image_block(SCREENSHOT)]}]},
+    ]
+    expected = materialize(state.messages)
+
+    assert materialize(reload(state, tmp_path / "chat.snap").messages) == expected
+
+
+def test_non_canonical_base64_survives_unchanged(tmp_path):
+    state = SessionState()
+    values = [
+        "QR==",  # decodes, but re-encodes as "QQ=="
+        "not base64!" * PAYLOAD_THRESHOLD,
+        SCREENSHOT[:-4] + "QR==",
+    ]
+    state.messages = [{"role": "user", "content": [image_block(value) for value in values]}]
+
+    restored = materialize(reload(state, tmp_path / "chat.snap").messages)
+    assert [block["source"]["data"] for block in restored[0]["content"]] == values
+
+
+def test_save_over_a_snapshot_that_is_still_mapped(tmp_path):
+    path = tmp_path / "chat.snap"
+    state = SessionState()
+    state.messages = [{"role": "user", "content": [image_block(SCREENSHOT)]}]
+    loaded = reload(state, path)
+
+    # The loaded state still reads its payloads from the old file
+    loaded.messages.append({"role": "assistant", "content": "x" * PAYLOAD_THRESHOLD})
+    expected = materialize(loaded.messages)
+    loaded.save(path)
+
+    assert materialize(loaded.messages) == expected
+    assert materialize(SessionState.load(path).messages) == expected
+
+
+def test_restored_blobs_are_not_sent_again(tmp_path):
+    state = SessionState()
+    image = types.ImageContent(type="image", data=SCREENSHOT, mimeType="image/png")
+    first = state.blobs.tool_result_content([image], "screenshot")
+
+    restored = reload(state, tmp_path / "chat.snap")
+    second = restored.blobs.tool_result_content([image], "screenshot")
+
+    assert first[0]["type"] == "image"
+    assert second[0]["type"] == "text"
+
+
+def test_cached_results_replay_raw_content(tmp_path):
+    state = SessionState()
+    image = types.ImageContent(type="image", data=SCREENSHOT, mimeType="image/png")
+    state.cache_result(READ_FILE, {"path": "a.png"}, [image])
+
+    restored = reload(state, tmp_path / "chat.snap")
+    assert restored.cached_result("read_file", {"path": "b.png"}) is None
+    cached = restored.cached_result("read_file", {"path": "a.png"})
+    assert cached == [image]
+
+    # A new conversation has not seen the image yet, so it is sent in full
+    content = SessionState().blobs.tool_result_content(cached, "read_file")
+    assert content[0]["type"] == "image"
+    assert content[0]["source"]["data"] == SCREENSHOT
+
+
+def test_changed_tools_lose_their_cached_results(tmp_path):
+    state = SessionState()
+    text = [types.TextContent(type="text", text="hello")]
+    other = READ_FILE.model_copy(update={"name": "list_dir"})
+    state.cache_result(READ_FILE, {"path": "a.txt"}, text)
+    state.cache_result(other, {"path": "."}, text)
+
+    restored = reload(state, tmp_path / "chat.snap")
+    changed = READ_FILE.model_copy(update={"description": "Reads a file, now with line numbers"})
+    restored.sync_tools([changed, other])
+
+    assert restored.cached_result("read_file", {"path": "a.txt"}) is None
+    assert restored.cached_result("list_dir", {"path": "."}) == text
+    assert restored.cached_result_count == 1